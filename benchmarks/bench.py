@@ -0,0 +1,268 @@
+"""Stage-level benchmarks of qpyr across versions and error correction levels.
+
+Every stage of the pipeline is timed on its own, for a byte mode payload that fills each version. The
+results are written as JSON and can be compared against a stored baseline:
+
+    python -m benchmarks.bench --output baseline.json
+    python -m benchmarks.bench --versions 1-10,40 --ecls L,H --output results.json --baseline baseline.json
+
+The cold import time of the package and of its heavier parts is measured too, each sample in a fresh
+interpreter, and reported as import/<name>.
+
+The comparison flags a regression when the time of a stage grows by more than --threshold, and the script
+then exits with status 1. It compares the fastest sample by default, which is far less sensitive to other
+load on the machine than the median or the 99th percentile, which can be chosen with --metric.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import string
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+import PIL
+
+from qpyr._lib.data_masking import (
+    get_adjacent_modules_penalty,
+    get_finder_pattern_penalty,
+    get_penalty_scores,
+    get_proportion_penalty,
+    get_same_color_block_penalty,
+)
+from qpyr._lib.draw import draw
+from qpyr._lib.encode import get_best_mode, get_data_codewords
+from qpyr._lib.error_correction import add_ecc_and_interleave
+from qpyr._lib.matrix import apply_masks, get_function_template, matrix, place_codewords
+from qpyr._lib.png import write_png
+from qpyr._lib.utils import get_segment_capacity_bits_table
+from qpyr._lib.vector import write_svg
+
+# Every sample times enough calls of a stage to take at least this long.
+MIN_SAMPLE_SECONDS = 0.002
+DEFAULT_REPEAT = 11
+DEFAULT_THRESHOLD = 1.25
+# Differences below this are timer noise, whatever the ratio.
+MIN_REGRESSION_SECONDS = 1e-6
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Statements whose cold import time is measured, from an interpreter that has imported nothing of qpyr.
+IMPORTS: Dict[str, str] = {
+    "qpyr": "import qpyr",
+    "matrix": "import qpyr._lib.encode, qpyr._lib.matrix",
+    "png": "import qpyr._lib.png",
+    "raster": "import qpyr._lib.draw",
+    "parallel": "import qpyr._lib.parallel",
+}
+
+
+class StageInput(NamedTuple):
+    version: int
+    ecl: str
+    payload: str
+    data_codewords: bytes
+    codewords: bytes
+    placed: np.ndarray  # (1, n, n) grid with the codewords placed, before masking
+    masked: np.ndarray  # (n, n) grid with mask 0 and its format information applied
+    finished: np.ndarray  # finished matrix, including the quiet zone
+
+
+def get_stage_input(version: int, ecl: str, seed: int = 0) -> StageInput:
+    """Returns the inputs of every stage for a lowercase byte mode payload that just fills version."""
+    length = get_segment_capacity_bits_table("byte", ecl)[version - 1] // 8
+    payload = "".join(random.Random(seed).choices(string.ascii_lowercase, k=length))
+    data_version, data_codewords = get_data_codewords(payload, ecl)
+    assert data_version == version
+    codewords = bytes(add_ecc_and_interleave(version, ecl, bytearray(data_codewords)))
+    placed = place_codewords([codewords], get_function_template(version).grid[np.newaxis].copy(), version)
+    masked = apply_masks(placed[0], version, ecl)[0]
+    finished = matrix(codewords, version, ecl)
+    return StageInput(version, ecl, payload, data_codewords, codewords, placed, masked, finished)
+
+
+# Every stage returns the function to time, given the prepared inputs.
+STAGES: Dict[str, Callable[[StageInput], Callable[[], object]]] = {
+    "get_best_mode": lambda inputs: lambda: get_best_mode(inputs.payload),
+    "get_data_codewords": lambda inputs: lambda: get_data_codewords(inputs.payload, inputs.ecl),
+    "add_ecc_and_interleave": lambda inputs: lambda: add_ecc_and_interleave(
+        inputs.version, inputs.ecl, bytearray(inputs.data_codewords)
+    ),
+    "place_codewords": lambda inputs: lambda: place_codewords(
+        [inputs.codewords], get_function_template(inputs.version).grid[np.newaxis].copy(), inputs.version
+    ),
+    "apply_masks": lambda inputs: lambda: apply_masks(inputs.placed, inputs.version, inputs.ecl),
+    "adjacent_modules_penalty": lambda inputs: lambda: get_adjacent_modules_penalty(inputs.masked),
+    "same_color_block_penalty": lambda inputs: lambda: get_same_color_block_penalty(inputs.masked),
+    "finder_pattern_penalty": lambda inputs: lambda: get_finder_pattern_penalty(inputs.masked, quiet_zone=4),
+    "proportion_penalty": lambda inputs: lambda: get_proportion_penalty(inputs.masked),
+    "penalty_scores": lambda inputs: lambda: get_penalty_scores(
+        apply_masks(inputs.placed, inputs.version, inputs.ecl), quiet_zone=4
+    ),
+    "matrix": lambda inputs: lambda: matrix(inputs.codewords, inputs.version, inputs.ecl),
+    "draw": lambda inputs: lambda: draw(inputs.finished),
+    "write_png": lambda inputs: lambda: write_png(inputs.finished),
+    "write_svg": lambda inputs: lambda: write_svg(inputs.finished),
+}
+
+
+def time_function(function: Callable[[], object], repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """Returns the min, median and 99th percentile seconds per call over repeat samples."""
+    function()  # warm up caches
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_SAMPLE_SECONDS:
+            break
+        number *= 2
+
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        samples.append((time.perf_counter() - start) / number)
+    return _summarize(samples, number)
+
+
+def time_import(statement: str, repeat: int = DEFAULT_REPEAT) -> Dict[str, float]:
+    """Returns the min, median and 99th percentile seconds that statement takes in a fresh interpreter."""
+    code = f"import time\nstart = time.perf_counter()\n{statement}\nprint(time.perf_counter() - start)"
+    samples = [
+        float(subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True).stdout)
+        for _ in range(repeat)
+    ]
+    return _summarize(samples, 1)
+
+
+def _summarize(samples: List[float], number: int) -> Dict[str, float]:
+    p99 = statistics.quantiles(samples, n=100, method="inclusive")[98] if len(samples) > 1 else samples[0]
+    return {"min": min(samples), "median": statistics.median(samples), "p99": p99, "number": number}
+
+
+def get_key(stage: str, version: int, ecl: str) -> str:
+    return f"{stage}/v{version}/{ecl}"
+
+
+def run(
+    versions: Sequence[int],
+    ecls: Sequence[str],
+    stages: Sequence[str],
+    repeat: int = DEFAULT_REPEAT,
+    verbose=False,
+    imports: Sequence[str] = (),
+) -> Dict[str, object]:
+    results: Dict[str, Dict[str, float]] = {}
+    for name in imports:
+        results[f"import/{name}"] = time_import(IMPORTS[name], repeat)
+        if verbose:
+            print(f"{'import/' + name:40} {results[f'import/{name}']['median'] * 1e6:12.1f} us", file=sys.stderr)
+    for version in versions:
+        for ecl in ecls:
+            inputs = get_stage_input(version, ecl)
+            for stage in stages:
+                results[get_key(stage, version, ecl)] = time_function(STAGES[stage](inputs), repeat)
+                if verbose:
+                    median = results[get_key(stage, version, ecl)]["median"]
+                    print(f"{get_key(stage, version, ecl):40} {median * 1e6:12.1f} us", file=sys.stderr)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pillow": PIL.__version__,
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        },
+        "results": results,
+    }
+
+
+class Comparison(NamedTuple):
+    key: str
+    baseline: float  # seconds per call
+    current: float
+    ratio: float
+
+
+def compare(
+    results: Dict[str, object], baseline: Dict[str, object], threshold: float = DEFAULT_THRESHOLD, metric="min"
+) -> List[Comparison]:
+    """Returns the stages whose time, by the given metric, exceeds their baseline by more than threshold times,
+    largest slowdown first. Stages that are missing from either side are ignored."""
+    current_results: Dict[str, Dict[str, float]] = results["results"]  # type: ignore
+    baseline_results: Dict[str, Dict[str, float]] = baseline["results"]  # type: ignore
+    regressions = []
+    for key, timing in current_results.items():
+        if key not in baseline_results:
+            continue
+        current, previous = timing[metric], baseline_results[key][metric]
+        if current > previous * threshold and current - previous > MIN_REGRESSION_SECONDS:
+            regressions.append(Comparison(key, previous, current, current / previous))
+    return sorted(regressions, key=lambda comparison: comparison.ratio, reverse=True)
+
+
+def parse_versions(text: str) -> List[int]:
+    """Parses a list of versions and ranges such as "1-10,20,40"."""
+    versions: List[int] = []
+    for part in text.split(","):
+        first, _, last = part.partition("-")
+        versions.extend(range(int(first), int(last or first) + 1))
+    if not all(1 <= version <= 40 for version in versions):
+        raise ValueError("Versions must be between 1 and 40")
+    return versions
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark every stage of qpyr across versions and ECLs.")
+    parser.add_argument("--versions", default="1-40", help="versions and ranges, e.g. 1-10,20,40")
+    parser.add_argument("--ecls", default="L,M,Q,H", help="error correction levels, e.g. L,H")
+    parser.add_argument("--stages", default=",".join(STAGES), help="stages to run, all by default, none if empty")
+    parser.add_argument("--imports", default=",".join(IMPORTS), help="imports to time, all by default, none if empty")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="samples per stage")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", help="compare against results previously written with --output")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="slowdown flagged as regression")
+    parser.add_argument("--metric", choices=("min", "median", "p99"), default="min", help="timing to compare")
+    parser.add_argument("--quiet", action="store_true", help="do not print timings while running")
+    args = parser.parse_args(argv)
+
+    stages = args.stages.split(",") if args.stages else []
+    unknown_stages = set(stages) - set(STAGES)
+    if unknown_stages:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown_stages))}")
+    imports = args.imports.split(",") if args.imports else []
+    unknown_imports = set(imports) - set(IMPORTS)
+    if unknown_imports:
+        parser.error(f"unknown imports: {', '.join(sorted(unknown_imports))}")
+    results = run(
+        parse_versions(args.versions), args.ecls.split(","), stages, args.repeat, not args.quiet, imports=imports
+    )
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=2)
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as fp:
+        baseline = json.load(fp)
+    regressions = compare(results, baseline, args.threshold, args.metric)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression.key}: {regression.baseline * 1e6:.1f} us -> {regression.current * 1e6:.1f} us "
+            f"({regression.ratio:.2f}x)"
+        )
+    print(f"{len(regressions)} regressions above {args.threshold:.2f}x")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1 +1,80 @@
-from qpyr.main import main
+from importlib import import_module
+from typing import TYPE_CHECKING, Any, List
+
+from qpyr.main import get_masked_matrix, get_matrices, get_matrix, get_structured_append, main
+
+if TYPE_CHECKING:
+    from qpyr._lib.aio import AsyncQR
+    from qpyr._lib.cache import CacheStats, QRCache
+    from qpyr._lib.matrix import MaskedMatrices, PackedMatrix, pack_matrix, unpack_matrix
+    from qpyr._lib.output import write_image
+    from qpyr._lib.png import write_png
+    from qpyr._lib.stream import DirectorySink, FileSink, StreamItem, stream_matrices
+    from qpyr._lib.tracing import StageEvent, trace
+    from qpyr._lib.vector import write_eps, write_pdf, write_svg
+    from qpyr._lib.web import ASGIApp, WSGIApp
+
+# Everything else is imported on first access, so that `import qpyr` does not import numpy or Pillow.
+_LAZY_EXPORTS = {
+    "AsyncQR": "qpyr._lib.aio",
+    "CacheStats": "qpyr._lib.cache",
+    "QRCache": "qpyr._lib.cache",
+    "MaskedMatrices": "qpyr._lib.matrix",
+    "PackedMatrix": "qpyr._lib.matrix",
+    "pack_matrix": "qpyr._lib.matrix",
+    "unpack_matrix": "qpyr._lib.matrix",
+    "write_image": "qpyr._lib.output",
+    "write_png": "qpyr._lib.png",
+    "DirectorySink": "qpyr._lib.stream",
+    "FileSink": "qpyr._lib.stream",
+    "StreamItem": "qpyr._lib.stream",
+    "stream_matrices": "qpyr._lib.stream",
+    "StageEvent": "qpyr._lib.tracing",
+    "trace": "qpyr._lib.tracing",
+    "write_eps": "qpyr._lib.vector",
+    "write_pdf": "qpyr._lib.vector",
+    "write_svg": "qpyr._lib.vector",
+    "ASGIApp": "qpyr._lib.web",
+    "WSGIApp": "qpyr._lib.web",
+}
+
+# Listed literally, rather than built from _LAZY_EXPORTS, so that linters see the TYPE_CHECKING imports used.
+__all__ = [
+    "get_masked_matrix",
+    "get_matrices",
+    "get_matrix",
+    "get_structured_append",
+    "main",
+    "AsyncQR",
+    "CacheStats",
+    "QRCache",
+    "MaskedMatrices",
+    "PackedMatrix",
+    "pack_matrix",
+    "unpack_matrix",
+    "write_image",
+    "write_png",
+    "DirectorySink",
+    "FileSink",
+    "StreamItem",
+    "stream_matrices",
+    "StageEvent",
+    "trace",
+    "write_eps",
+    "write_pdf",
+    "write_svg",
+    "ASGIApp",
+    "WSGIApp",
+]
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(import_module(_LAZY_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(_LAZY_EXPORTS))
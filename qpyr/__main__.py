@@ -0,0 +1,5 @@
+import sys
+
+from qpyr.cli import main
+
+sys.exit(main())
@@ -0,0 +1,172 @@
+import asyncio
+from concurrent.futures import Executor
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from qpyr._lib.cache import LRUCache, QRCache
+from qpyr._lib.matrix import MaskOption
+from qpyr._lib.output import write_image
+from qpyr.main import get_matrix
+
+# Default number of QR codes computed at the same time by one AsyncQR.
+DEFAULT_MAX_CONCURRENCY = 4
+
+
+def _create_image_bytes(
+    data: str, fileformat: str, ecl: str, mask: MaskOption, boost_ecl: bool, cell_size: int
+) -> bytes:
+    return write_image(get_matrix(data, ecl, mask, boost_ecl), fileformat, cell_size=cell_size)  # type: ignore
+
+
+class _Computation:
+    """A computation shared by every concurrent request for the same QR code."""
+
+    def __init__(self, task: "asyncio.Future[Any]"):
+        self.task = task
+        self.waiters = 0
+
+
+class _LoopState:
+    """The concurrency limit and the pending computations of an AsyncQR in one event loop. Neither can be
+    shared between loops, since asyncio primitives and futures are bound to the loop they are used in."""
+
+    def __init__(self, max_concurrency: int):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.computations: Dict[Hashable, _Computation] = {}
+
+
+class AsyncQR:
+    """asyncio counterparts of get_matrix() and QRCache.get_image_bytes() that run the CPU-bound work in
+    executor, so that the event loop keeps serving other requests.
+
+    executor is the loop's default thread pool if None. A ProcessPoolExecutor isolates the event loop best,
+    since the mask search and rendering hold the GIL for most of their time. At most max_concurrency QR codes
+    are computed at once and further requests wait for a slot without occupying the executor. Concurrent
+    requests for the same QR code share one computation, and matrices are returned read-only because the
+    callers share them. With a cache, results are looked up in and stored into its tiers, shared with any
+    synchronous use of the same QRCache.
+
+    An AsyncQR can be used from several event loops, e.g. one per asyncio.run(), each with its own
+    concurrency limit and pending computations.
+
+    Cancelling a request returns immediately. The shared computation is cancelled once no request waits for
+    it any more: work that is still waiting for a slot or for the executor is dropped, but work that is
+    already running finishes in the background, as executors cannot interrupt it.
+    """
+
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+        cache: Optional[QRCache] = None,
+    ):
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency must be at least 1")
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.cache = cache
+        # Created on first use in every event loop. The state of closed loops is dropped when a new loop starts.
+        self._loop_states: Dict[asyncio.AbstractEventLoop, _LoopState] = {}
+
+    async def get_matrix(self, data: str, ecl="M", mask: MaskOption = "exhaustive", boost_ecl=False) -> NDArray:
+        key = (data, ecl, mask, boost_ecl)
+        return await self._get(
+            ("matrix",) + key,
+            self.cache.matrices if self.cache is not None else None,
+            key,
+            lambda value: value.nbytes,
+            get_matrix,
+            *key,
+        )
+
+    async def get_image_bytes(
+        self,
+        data: str,
+        fileformat="png",
+        ecl="M",
+        mask: MaskOption = "exhaustive",
+        boost_ecl=False,
+        cell_size: int = 20,
+    ) -> bytes:
+        """Returns the file contents of the QR code of data in fileformat, as written by write_image()."""
+        fileformat = fileformat.lower()
+        key = (data, fileformat, ecl, mask, boost_ecl, cell_size)
+        return await self._get(
+            ("image",) + key,
+            self.cache.images if self.cache is not None else None,
+            key,
+            len,
+            _create_image_bytes,
+            data,
+            fileformat,
+            ecl,
+            mask,
+            boost_ecl,
+            cell_size,
+        )
+
+    async def _get(
+        self,
+        computation_key: Hashable,
+        tier: Optional[LRUCache],
+        cache_key: Hashable,
+        size_of: Callable[[Any], int],
+        function: Callable[..., Any],
+        *args: Any,
+    ) -> Any:
+        if tier is not None:
+            value = tier.get(cache_key)
+            if value is not None:
+                return value
+
+        state = self._get_loop_state()
+        computation = state.computations.get(computation_key)
+        if computation is None:
+            computation = _Computation(
+                asyncio.ensure_future(self._compute(state, tier, cache_key, size_of, function, *args))
+            )
+            state.computations[computation_key] = computation
+            computation.task.add_done_callback(lambda _: _forget(state, computation_key, computation))
+
+        computation.waiters += 1
+        try:
+            return await asyncio.shield(computation.task)
+        finally:
+            computation.waiters -= 1
+            if computation.waiters == 0 and not computation.task.done():
+                # Nobody waits for the result any more. A later request starts a new computation.
+                _forget(state, computation_key, computation)
+                computation.task.cancel()
+
+    def _get_loop_state(self) -> _LoopState:
+        loop = asyncio.get_running_loop()
+        state = self._loop_states.get(loop)
+        if state is None:
+            for closed_loop in [other for other in self._loop_states if other.is_closed()]:
+                del self._loop_states[closed_loop]
+            state = self._loop_states[loop] = _LoopState(self.max_concurrency)
+        return state
+
+    async def _compute(
+        self,
+        state: _LoopState,
+        tier: Optional[LRUCache],
+        cache_key: Hashable,
+        size_of: Callable[[Any], int],
+        function: Callable[..., Any],
+        *args: Any,
+    ) -> Any:
+        async with state.semaphore:
+            value = await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+        if isinstance(value, np.ndarray):
+            value.flags.writeable = False  # shared by every waiter and cache hit
+        if tier is not None:
+            tier.put(cache_key, value, size_of(value))
+        return value
+
+
+def _forget(state: _LoopState, computation_key: Hashable, computation: _Computation) -> None:
+    if state.computations.get(computation_key) is computation:
+        del state.computations[computation_key]
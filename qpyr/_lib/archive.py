@@ -0,0 +1,92 @@
+import abc
+import io
+import os
+import tarfile
+import time
+import zipfile
+from typing import Any
+
+
+class Archive(abc.ABC):
+    """Destination of many small files, each named after its index and written in one call without a
+    temporary file. Used as a context manager, which closes it."""
+
+    @abc.abstractmethod
+    def write(self, index: int, extension: str, data: bytes) -> str:
+        """Stores data as the file of index and returns its name in the archive."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "Archive":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class ZipArchive(Archive):
+    """Writes files into a zip archive. PNG files are stored as they are, since they are already compressed,
+    and every other format is deflated."""
+
+    def __init__(self, path: str):
+        self.zip_file = zipfile.ZipFile(path, "w")
+
+    def write(self, index: int, extension: str, data: bytes) -> str:
+        name = f"{index}.{extension}"
+        compression = zipfile.ZIP_STORED if extension == "png" else zipfile.ZIP_DEFLATED
+        self.zip_file.writestr(zipfile.ZipInfo(name, time.localtime()[:6]), data, compress_type=compression)
+        return name
+
+    def close(self) -> None:
+        self.zip_file.close()
+
+
+class TarArchive(Archive):
+    """Writes files into a tar archive, compressed with gzip if path ends with .gz or .tgz."""
+
+    def __init__(self, path: str):
+        mode = "w:gz" if path.endswith((".gz", ".tgz")) else "w"
+        self.tar_file = tarfile.open(path, mode)
+
+    def write(self, index: int, extension: str, data: bytes) -> str:
+        info = tarfile.TarInfo(f"{index}.{extension}")
+        info.size = len(data)
+        info.mtime = int(time.time())
+        self.tar_file.addfile(info, io.BytesIO(data))
+        return info.name
+
+    def close(self) -> None:
+        self.tar_file.close()
+
+
+class ShardedDirectory(Archive):
+    """Writes files into subdirectories of path of at most shard_size files each, so that no directory grows
+    to millions of entries: file 12345 with the default shard_size is 12/12345.png."""
+
+    def __init__(self, path: str, shard_size: int = 1000):
+        if shard_size < 1:
+            raise ValueError("shard_size must be at least 1")
+        self.path = path
+        self.shard_size = shard_size
+        self._shard = -1
+
+    def write(self, index: int, extension: str, data: bytes) -> str:
+        shard = index // self.shard_size
+        if shard != self._shard:
+            os.makedirs(os.path.join(self.path, str(shard)), exist_ok=True)
+            self._shard = shard
+        name = os.path.join(str(shard), f"{index}.{extension}")
+        with open(os.path.join(self.path, name), "wb") as fp:
+            fp.write(data)
+        return name
+
+
+def open_archive(path: str, shard_size: int = 1000) -> Archive:
+    """Returns a ZipArchive or TarArchive if path ends with .zip, .tar, .tar.gz or .tgz, or else a
+    ShardedDirectory at path."""
+    if path.endswith(".zip"):
+        return ZipArchive(path)
+    if path.endswith((".tar", ".tar.gz", ".tgz")):
+        return TarArchive(path)
+    return ShardedDirectory(path, shard_size)
@@ -0,0 +1,98 @@
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from qpyr._lib.encode import get_data_codewords
+from qpyr._lib.error_correction import add_ecc_and_interleave_stack
+from qpyr._lib.matrix import MaskOption, matrices
+from qpyr._lib.tracing import get_tracer, record
+from qpyr._lib.utils import get_grid_size
+
+# Upper bound on the number of modules in one (k, 8, n, n) stack of mask candidates, to keep memory bounded.
+MAX_STACK_MODULES = 1 << 22
+
+
+def get_stack_size(version: int) -> int:
+    """Returns how many codes of the given version are processed together in one stack."""
+    grid_size = get_grid_size(version)
+    return max(1, MAX_STACK_MODULES // (8 * grid_size * grid_size))
+
+
+def bucket_by_version(
+    data: Iterable[str], ecl: str, errors: Optional[Dict[str, ValueError]] = None
+) -> Dict[int, List[Tuple[str, bytes]]]:
+    """Encodes every distinct payload once and groups the (payload, data codewords) pairs by version. Error
+    correction is left to the caller so that it can run on a whole bucket at once.
+
+    A payload that cannot be encoded raises its ValueError, unless errors is given: the error is then stored in
+    errors under the payload, and the payload is left out of the buckets.
+    """
+    result: Dict[int, List[Tuple[str, bytes]]] = defaultdict(list)
+    for payload in dict.fromkeys(data):
+        try:
+            version, data_codewords = get_data_codewords(payload, ecl=ecl)
+        except ValueError as error:
+            if errors is None:
+                raise
+            errors[payload] = error
+            continue
+        result[version].append((payload, data_codewords))
+    return result
+
+
+def generate_bucket(
+    version: int, ecl: str, data_codewords: List[bytes], quiet_zone_border: int, mask: MaskOption
+) -> List[NDArray]:
+    """Returns the matrices of data codewords that all belong to the same version."""
+    tracer = get_tracer()
+    result: List[NDArray] = []
+    stack_size = get_stack_size(version)
+    for start in range(0, len(data_codewords), stack_size):
+        chunk = data_codewords[start : start + stack_size]
+        stage_start = time.perf_counter() if tracer else 0.0
+        stacked = np.frombuffer(b"".join(chunk), dtype=np.uint8).reshape(len(chunk), -1)
+        codewords = add_ecc_and_interleave_stack(version, ecl, stacked)
+        if tracer:
+            record(tracer, "error_correction", stage_start, version=version, ecl=ecl, count=len(chunk))
+        result.extend(matrices([row.tobytes() for row in codewords], version, ecl, quiet_zone_border, mask))
+    return result
+
+
+def generate_matrices(
+    data: Iterable[str], ecl: str, quiet_zone_border: int = 4, mask: MaskOption = "exhaustive"
+) -> List[NDArray]:
+    """Returns the matrix of every payload, in input order.
+
+    Payloads are bucketed by version and every bucket runs through placement and mask selection as stacks.
+    Duplicate payloads are computed once and share the same matrix object. mask is passed on to matrices().
+    """
+    payloads = list(data)
+    results: Dict[str, NDArray] = {}
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+    buckets = bucket_by_version(payloads, ecl)
+    if tracer:
+        record(tracer, "encode", start, ecl=ecl, count=len(payloads), versions=sorted(buckets))
+    for version, items in buckets.items():
+        stack = generate_bucket(version, ecl, [codewords for _, codewords in items], quiet_zone_border, mask)
+        results.update(zip([payload for payload, _ in items], stack))
+    return [results[payload] for payload in payloads]
+
+
+def generate_symbol_matrices(
+    symbols: Iterable[Tuple[int, bytes]], ecl: str, quiet_zone_border: int = 4, mask: MaskOption = "exhaustive"
+) -> List[NDArray]:
+    """Returns the matrix of every already encoded (version, data codewords) symbol, in input order."""
+    indexes: Dict[int, List[int]] = defaultdict(list)
+    buckets: Dict[int, List[bytes]] = defaultdict(list)
+    for index, (version, data_codewords) in enumerate(symbols):
+        indexes[version].append(index)
+        buckets[version].append(data_codewords)
+
+    results: Dict[int, NDArray] = {}
+    for version, data_codewords in buckets.items():
+        results.update(zip(indexes[version], generate_bucket(version, ecl, data_codewords, quiet_zone_border, mask)))
+    return [results[index] for index in range(len(results))]
@@ -0,0 +1,128 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, NamedTuple, Optional, Tuple, TypeVar
+
+from numpy.typing import NDArray
+
+from qpyr._lib.matrix import MaskOption
+from qpyr._lib.output import write_image
+from qpyr.main import get_matrix
+
+Value = TypeVar("Value")
+
+# Default memory bound of every tier of a QRCache.
+DEFAULT_MAX_BYTES = 32 * 1024 * 1024
+
+# Rough per-entry overhead of the key, the entry and the array or bytes object, counted against the bound.
+ENTRY_OVERHEAD_BYTES = 256
+
+
+class CacheStats(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size_bytes: int  # estimated memory held by the entries, at most the bound of the cache
+
+
+class LRUCache(Generic[Value]):
+    """Thread-safe least recently used cache bounded by the estimated memory size of its values rather than by
+    the number of entries."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        if max_bytes < 0:
+            raise ValueError("max_bytes must not be negative")
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Value, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._size_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Hashable) -> Optional[Value]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Value, size: int) -> None:
+        """Stores value, evicting the least recently used entries until it fits. A value larger than the whole
+        cache is not stored."""
+        size += ENTRY_OVERHEAD_BYTES
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size_bytes -= previous[1]
+            if size > self.max_bytes:
+                return
+            while self._size_bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._size_bytes -= evicted_size
+                self._evictions += 1
+            self._entries[key] = (value, size)
+            self._size_bytes += size
+
+    def get_or_create(self, key: Hashable, create: Callable[[], Value], size_of: Callable[[Value], int]) -> Value:
+        """Returns the cached value of key, or creates, stores and returns it. create runs without holding the
+        lock, so concurrent misses on the same key may each create the value."""
+        value = self.get(key)
+        if value is None:
+            value = create()
+            self.put(key, value, size_of(value))
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size_bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(self._hits, self._misses, self._evictions, len(self._entries), self._size_bytes)
+
+
+class QRCache:
+    """Opt-in memoization of QR codes with one tier for module matrices and one for encoded image files, each
+    an LRUCache bounded in bytes. Matrices are returned read-only because every hit shares the same array."""
+
+    def __init__(self, max_matrix_bytes: int = DEFAULT_MAX_BYTES, max_image_bytes: int = DEFAULT_MAX_BYTES):
+        self.matrices: LRUCache[NDArray] = LRUCache(max_matrix_bytes)
+        self.images: LRUCache[bytes] = LRUCache(max_image_bytes)
+
+    def get_matrix(self, data: str, ecl="M", mask: MaskOption = "exhaustive", boost_ecl=False) -> NDArray:
+        def create() -> NDArray:
+            qr_matrix = get_matrix(data, ecl=ecl, mask=mask, boost_ecl=boost_ecl)
+            qr_matrix.flags.writeable = False  # shared by every caller that hits the cache
+            return qr_matrix
+
+        return self.matrices.get_or_create((data, ecl, mask, boost_ecl), create, lambda qr_matrix: qr_matrix.nbytes)
+
+    def get_image_bytes(
+        self,
+        data: str,
+        fileformat="png",
+        ecl="M",
+        mask: MaskOption = "exhaustive",
+        boost_ecl=False,
+        cell_size: int = 20,
+    ) -> bytes:
+        """Returns the file contents of the QR code of data in fileformat, as written by write_image()."""
+        fileformat = fileformat.lower()
+
+        def create() -> bytes:
+            qr_matrix = self.get_matrix(data, ecl=ecl, mask=mask, boost_ecl=boost_ecl)
+            return write_image(qr_matrix, fileformat, cell_size=cell_size)
+
+        return self.images.get_or_create((data, fileformat, ecl, mask, boost_ecl, cell_size), create, len)
+
+    def clear(self) -> None:
+        self.matrices.clear()
+        self.images.clear()
+
+    def stats(self) -> Dict[str, CacheStats]:
+        return {"matrices": self.matrices.stats(), "images": self.images.stats()}
@@ -1,9 +1,11 @@
-import math
 from typing import Callable, List
 
 import numpy as np
 from numpy.typing import NDArray
 
+# Every FAST_SAMPLE_STRIDE-th row and column is scored by get_estimated_penalty_scores().
+FAST_SAMPLE_STRIDE = 4
+
 
 class PenaltyPoint:
     N1 = 3
@@ -14,14 +16,14 @@ class PenaltyPoint:
 
 def get_masks() -> List[Callable]:
     """
-    Return the mask function for the given mask pattern_reference.
+    Return the mask functions indexed by mask pattern_reference. They accept ints or NumPy index arrays.
     """
     pattern_reference_map = [
         lambda i, j: (i + j) % 2 == 0,
         lambda i, j: i % 2 == 0,
         lambda i, j: j % 3 == 0,
         lambda i, j: (i + j) % 3 == 0,
-        lambda i, j: (math.floor(i / 2) + math.floor(j / 3)) % 2 == 0,
+        lambda i, j: (i // 2 + j // 3) % 2 == 0,
         lambda i, j: (i * j) % 2 + (i * j) % 3 == 0,
         lambda i, j: ((i * j) % 2 + (i * j) % 3) % 2 == 0,
         lambda i, j: ((i * j) % 3 + (i + j) % 2) % 2 == 0,
@@ -29,81 +31,80 @@ def get_masks() -> List[Callable]:
     return pattern_reference_map
 
 
-def _calculate_adjacent_penalty_inline(array: List[int]) -> int:
-    consecutive_run = 1
-    score = 0
-    for i, num in enumerate(array):
-        if i == 0:
-            continue
-
-        previous_number = array[i - 1]
+def _adjacent_penalty(lines: NDArray) -> NDArray:
+    """Returns the N1 penalty of runs along the last axis, summed per leading index of (..., m, length)."""
+    leading_shape = lines.shape[:-2]
+    flat_lines = lines.reshape(-1, lines.shape[-1])
 
-        if num == previous_number:
-            consecutive_run += 1
-            if consecutive_run == 5:
-                score += PenaltyPoint.N1
-            elif consecutive_run > 5:
-                score += 1
-        else:
-            consecutive_run = 1
+    # A run starts at the beginning of every line and wherever the value changes.
+    run_starts = np.ones(flat_lines.shape, dtype=bool)
+    run_starts[:, 1:] = flat_lines[:, 1:] != flat_lines[:, :-1]
+    start_indexes = np.flatnonzero(run_starts)
+    run_lengths = np.diff(np.append(start_indexes, flat_lines.size))
 
-    return score
+    # A run of 5 scores N1 and every further module in the run scores 1 more.
+    points = np.where(run_lengths >= 5, run_lengths - 5 + PenaltyPoint.N1, 0)
+    owners = start_indexes // (lines.shape[-2] * lines.shape[-1])
+    result = np.bincount(owners, weights=points, minlength=int(np.prod(leading_shape, dtype=int)))
+    return result.astype(int).reshape(leading_shape)
 
 
 def get_adjacent_modules_penalty(grid: NDArray) -> int:
-    result = 0
-    for row in grid.tolist():
-        result += _calculate_adjacent_penalty_inline(row)
-
-    for col in grid.T.tolist():
-        result += _calculate_adjacent_penalty_inline(col)
-
-    return result
+    result = _adjacent_penalty(grid) + _adjacent_penalty(grid.T)
+    return int(result)
 
 
-def _calculate_finder_penalty(array: NDArray) -> int:
+def _finder_penalty(lines: NDArray, quiet_zone: int) -> NDArray:
+    """Returns the N3 penalty of finder-like patterns along the last axis, summed per leading index of
+    (..., m, length). The lines are treated as if quiet_zone light modules surrounded them on both ends."""
     pattern = [1, 0, 1, 1, 1, 0, 1]
-    light_area = [0, 0, 0, 0]
+    light_area_length = 4
+    length = lines.shape[-1]
+    if length < len(pattern):
+        return np.zeros(lines.shape[:-2], dtype=int)
 
-    pattern1 = light_area + pattern
-    pattern2 = pattern + light_area
+    # The pattern core contains dark modules on both ends, so it always lies inside the line.
+    num_starts = length - len(pattern) + 1
+    starts = np.arange(num_starts)
+    dark = lines == 1
+    light = lines == 0
+    core = np.ones(lines.shape[:-1] + (num_starts,), dtype=bool)
+    for offset, value in enumerate(pattern):
+        core &= (dark if value else light)[..., offset : offset + num_starts]
 
-    total_pattern_length = len(pattern1)
+    # Cumulative count of non-light modules, extended by light_area_length entries on both ends so that
+    # not_light[..., i + light_area_length] counts the non-light modules before index i, clipped to the line.
+    not_light = np.zeros(lines.shape[:-1] + (length + 1 + 2 * light_area_length,), dtype=np.int16)
+    np.cumsum(~light, axis=-1, out=not_light[..., light_area_length + 1 : length + light_area_length + 1])
+    not_light[..., length + light_area_length + 1 :] = not_light[..., [length + light_area_length]]
 
-    patterns_found = 0
+    def no_dark_modules(begin: int) -> NDArray:
+        # True where the light area starting begin modules after the core start has no non-light modules.
+        area_start = not_light[..., light_area_length + begin :][..., :num_starts]
+        area_end = not_light[..., 2 * light_area_length + begin :][..., :num_starts]
+        return area_start == area_end
 
-    for i in range(len(array) - total_pattern_length + 1):
-        sub_array = array[i : i + total_pattern_length]
-        if np.array_equal(sub_array, pattern1):
-            patterns_found += 1
+    light_before = no_dark_modules(-light_area_length) & (starts - light_area_length >= -quiet_zone)
+    light_after = no_dark_modules(len(pattern)) & (starts + len(pattern) + light_area_length <= length + quiet_zone)
 
-        if np.array_equal(sub_array, pattern2):
-            patterns_found += 1
+    patterns_found = (core & light_before).sum(axis=(-2, -1)) + (core & light_after).sum(axis=(-2, -1))
+    return patterns_found * PenaltyPoint.N3
 
-    result = patterns_found * PenaltyPoint.N3
-    return result
 
+def get_finder_pattern_penalty(grid: NDArray, quiet_zone: int = 0) -> int:
+    result = _finder_penalty(grid, quiet_zone) + _finder_penalty(grid.T, quiet_zone)
+    return int(result)
 
-def get_finder_pattern_penalty(grid):
-    result = 0
-    for row in grid:
-        result += _calculate_finder_penalty(row)
 
-    for col in grid.T:
-        result += _calculate_finder_penalty(col)
+def _same_color_block_penalty(grid: NDArray) -> NDArray:
+    """Returns the N2 penalty of every grid in a (..., rows, cols) stack."""
+    top_left = grid[..., :-1, :-1]
+    blocks = (top_left == grid[..., :-1, 1:]) & (top_left == grid[..., 1:, :-1]) & (top_left == grid[..., 1:, 1:])
+    return blocks.sum(axis=(-2, -1)) * PenaltyPoint.N2
 
-    return result
 
-
-def get_same_color_block_penalty(grid: NDArray):
-    blocks_count = 0
-    grid_size = grid.shape[0]
-    for row in range(grid_size - 1):
-        for col in range(grid_size - 1):
-            if grid[row][col] == grid[row][col + 1] == grid[row + 1][col] == grid[row + 1][col + 1]:
-                blocks_count += 1
-    result = blocks_count * PenaltyPoint.N2
-    return result
+def get_same_color_block_penalty(grid: NDArray) -> int:
+    return int(_same_color_block_penalty(grid))
 
 
 def get_proportion_penalty(grid):
@@ -114,3 +115,26 @@ def get_proportion_penalty(grid):
     rating = int(deviation / 5)
     result = rating * PenaltyPoint.N4
     return result
+
+
+def get_penalty_scores(candidates: NDArray, quiet_zone: int = 0) -> NDArray:
+    """Returns the N1, N2, N3 and N4 penalty scores of every grid in a (..., n, n) stack as a (..., 4) array.
+    The finder pattern rule is scored as if quiet_zone light modules surrounded every grid."""
+    return get_estimated_penalty_scores(candidates, quiet_zone, stride=1)
+
+
+def get_estimated_penalty_scores(candidates: NDArray, quiet_zone: int = 0, stride: int = FAST_SAMPLE_STRIDE) -> NDArray:
+    """Same as get_penalty_scores(), except that the N1 and N3 penalties, which are the expensive ones, are only
+    scored on every stride-th row and column and scaled up by stride. With stride 1 the scores are exact."""
+    rows = candidates[..., ::stride, :]
+    columns = np.swapaxes(candidates, -1, -2)[..., ::stride, :]
+    black_proportion = (candidates == 1).sum(axis=(-2, -1)) / (candidates.shape[-2] * candidates.shape[-1])
+    deviation = np.abs((black_proportion * 100) - 50)
+
+    scores = [
+        (_adjacent_penalty(rows) + _adjacent_penalty(columns)) * stride,
+        _same_color_block_penalty(candidates),
+        (_finder_penalty(rows, quiet_zone) + _finder_penalty(columns, quiet_zone)) * stride,
+        (deviation / 5).astype(int) * PenaltyPoint.N4,
+    ]
+    return np.stack(scores, axis=-1)
@@ -1,11 +1,34 @@
-from typing import Optional
+import time
+from typing import Optional, Tuple, Union
+
+import numpy as np
 from numpy.typing import NDArray
-from PIL import Image, ImageDraw
+from PIL import Image, ImageColor
 
 from qpyr._lib.static import ColorValue
+from qpyr._lib.tracing import get_tracer, record
+
+Color = Union[str, Tuple[int, ...]]
+
+
+def _to_rgb(color: Color) -> Tuple[int, int, int]:
+    rgb = ImageColor.getrgb(color) if isinstance(color, str) else color
+    return rgb[0], rgb[1], rgb[2]
+
 
+def _expand(pixels: NDArray, cell_size: int) -> NDArray:
+    """Scales every module up to a cell_size x cell_size block of pixels."""
+    return np.repeat(np.repeat(pixels, cell_size, axis=0), cell_size, axis=1)
 
-def draw(grid: NDArray, cell_size: int = 20, outline=None) -> Image.Image:
+
+def draw(
+    grid: NDArray,
+    cell_size: int = 20,
+    outline: Optional[Color] = None,
+    mode: str = "1",
+    dark_color: Optional[Color] = None,
+    light_color: Optional[Color] = None,
+) -> Image.Image:
     """
     Draw a grid using PIL based on a 2D numpy array.
 
@@ -13,28 +36,59 @@ def draw(grid: NDArray, cell_size: int = 20, outline=None) -> Image.Image:
     - grid: A 2D numpy array of shape (n, n) containing 0, 1, -1, -2.
     - cell_size: The size of each cell in the grid in pixels.
     - outline: Color of outline, e.g. blue, #00ff00, (0, 0, 255), (0, 0, 255, 128)
+    - mode: "1" or "L", the mode of black and white images.
+    - dark_color, light_color: Colors of dark and light modules. The image is RGB when any color is given,
+      or when the grid contains DEFAULT_VALUE or DUMMY_VALUE modules, which are drawn lightgray and red.
     """
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+    image = _draw(grid, cell_size, outline, mode, dark_color, light_color)
+    if tracer:
+        record(tracer, "rasterization", start, size=image.size, mode=image.mode, cell_size=cell_size)
+    return image
+
+
+def _draw(
+    grid: NDArray,
+    cell_size: int,
+    outline: Optional[Color],
+    mode: str,
+    dark_color: Optional[Color],
+    light_color: Optional[Color],
+) -> Image.Image:
     # Validate the shape of the grid
     if grid.shape[0] != grid.shape[1]:
         raise ValueError("The input grid must be square (n x n).")
+    if mode not in ("1", "L"):
+        raise ValueError("Mode must be '1' or 'L'.")
+
+    has_placeholders = bool(((grid != ColorValue.WHITE) & (grid != ColorValue.BLACK)).any())
+    if outline is None and dark_color is None and light_color is None and not has_placeholders:
+        light = grid != ColorValue.BLACK
+        if mode == "1":
+            return Image.fromarray(_expand(light, cell_size))
+        return Image.fromarray(_expand(light.astype(np.uint8) * 255, cell_size))
+
+    # Anything that is not a known value is drawn as a light module.
+    light_rgb = _to_rgb(light_color or "white")
+    palette = np.array(
+        [
+            _to_rgb(dark_color or "black"),
+            _to_rgb("lightgray"),
+            _to_rgb("red"),
+            light_rgb,
+        ],
+        dtype=np.uint8,
+    )
+    indexes = np.full(grid.shape, 3)
+    indexes[grid == ColorValue.BLACK] = 0
+    indexes[grid == ColorValue.DEFAULT_VALUE] = 1
+    indexes[grid == ColorValue.DUMMY_VALUE] = 2
+    pixels = _expand(palette[indexes], cell_size)
 
-    # Initialize an image object with white background
-    img_size = grid.shape[0] * cell_size
-    img = Image.new("RGB", (img_size, img_size), "lightgray")
-    draw = ImageDraw.Draw(img)
-
-    color_map = {
-        ColorValue.WHITE: "white",
-        ColorValue.BLACK: "black",
-        ColorValue.DEFAULT_VALUE: "lightgray",
-        ColorValue.DUMMY_VALUE: "red",
-    }
-
-    for i in range(grid.shape[0]):  # Rows
-        for j in range(grid.shape[1]):  # Columns
-            x0, y0 = j * cell_size, i * cell_size  # Corrected here
-            x1, y1 = x0 + cell_size, y0 + cell_size
-            cell_value = grid[i, j]
-            cell_color = color_map.get(cell_value, "white")
-            draw.rectangle(((x0, y0), (x1, y1)), fill=cell_color, outline=outline)
-    return img
+    if outline is not None:
+        # Every cell is outlined, so the outlines form grid lines at every multiple of cell_size.
+        outline_rgb = _to_rgb(outline)
+        pixels[::cell_size, :] = outline_rgb
+        pixels[:, ::cell_size] = outline_rgb
+    return Image.fromarray(pixels)
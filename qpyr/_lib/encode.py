@@ -1,16 +1,41 @@
-import itertools
 import re
+import time
+from bisect import bisect_left
+from typing import List, Optional, Tuple
 
 from qpyr._lib.error_correction import add_ecc_and_interleave
-from qpyr._lib.static import ECC_CODEWORDS_PER_BLOCK, NUM_ERROR_CORRECTION_BLOCKS
+from qpyr._lib.static import (
+    ALPHANUMERIC_CHARSET,
+    ECC_CODEWORDS_PER_BLOCK,
+    ERROR_CORRECTION_LEVELS,
+    NUM_ERROR_CORRECTION_BLOCKS,
+)
+from qpyr._lib.tracing import get_tracer, record
 from qpyr._lib.utils import (
-    bits_to_bytearray,
-    bytearray_to_bits,
+    BitBuffer,
+    get_data_capacity_bits_table,
     get_num_raw_data_modules,
+    get_segment_capacity_bits_table,
     get_segment_character_bits_length,
     get_total_data_capacity_bytes,
 )
 
+Segment = Tuple[str, str]  # (mode, text)
+
+SEGMENT_MODES = ("numeric", "alphanumeric", "byte")
+NUMERIC_CHARSET = "0123456789"
+INFINITE_COST = float("inf")
+
+# Versions within a range share the same character count field widths.
+VERSION_RANGES = ((1, 9), (10, 26), (27, 40))
+
+# A segment header takes at least 13 bits, and a character saves at most 14/3 bits in a cheaper mode, so only
+# runs of 3 or more cheaper characters can make splitting a byte or alphanumeric segment worthwhile.
+SPLITTABLE_REGEXES = {
+    "alphanumeric": re.compile(r"[0-9]{3}"),
+    "byte": re.compile(r"[0-9A-Z $%*+./:-]{3}"),
+}
+
 
 def get_best_mode(data: str) -> str:
     numeric_regex: re.Pattern = re.compile(r"[0-9]*")
@@ -27,96 +52,275 @@ def get_best_mode(data: str) -> str:
         raise ValueError("Mode not supported")
 
 
-def get_segment_data(data):
-    data_segment = "".join([bin(x)[2:].zfill(8) for x in bytearray(data, "utf-8")])
+def get_segment_data(data: str, mode: str = "byte") -> BitBuffer:
+    data_segment = BitBuffer()
+    if mode == "numeric":
+        # Groups of 3 digits take 10 bits, a trailing group of 2 digits 7 bits and a single digit 4 bits.
+        for i in range(0, len(data), 3):
+            group = data[i : i + 3]
+            data_segment.append_bits(int(group), len(group) * 3 + 1)
+    elif mode == "alphanumeric":
+        # Pairs of characters take 11 bits and a trailing character 6 bits.
+        for i in range(0, len(data), 2):
+            pair = [ALPHANUMERIC_CHARSET.index(char) for char in data[i : i + 2]]
+            if len(pair) == 2:
+                data_segment.append_bits(pair[0] * 45 + pair[1], 11)
+            else:
+                data_segment.append_bits(pair[0], 6)
+    else:
+        data_segment.append_bytes(data.encode("utf-8"))
     return data_segment
 
 
-def get_segment_mode(mode):
-    return {"numeric": "0001", "alphanumeric": "0010", "byte": "0100"}[mode]
+def get_character_count(data: str, mode: str) -> int:
+    """Returns the number of characters of data as counted by the character count field: bytes in byte mode."""
+    if mode == "byte":
+        return len(data.encode("utf-8"))
+    return len(data)
 
 
-def get_segment_character_count(data_segment: str, mode: str, version: int):
-    result = ""
-    no_of_bytes = len(data_segment) // 8
-    if mode == "byte":
-        if version <= 9:
-            result = bin(no_of_bytes)[2:].zfill(8)
-        else:
-            result = bin(no_of_bytes)[2:].zfill(16)
+def get_data_bits_length(length: int, mode: str) -> int:
+    """Returns the number of data bits of a segment of length characters, or bytes in byte mode."""
+    if mode == "numeric":
+        return length // 3 * 10 + (0, 4, 7)[length % 3]
+    elif mode == "alphanumeric":
+        return length // 2 * 11 + length % 2 * 6
+    return length * 8
+
+
+def get_segment_data_bits_length(data: str, mode: str) -> int:
+    """Returns len(get_segment_data(data, mode)) without building the bits."""
+    return get_data_bits_length(get_character_count(data, mode), mode)
+
+
+def get_segment_mode(mode: str) -> BitBuffer:
+    result = BitBuffer()
+    result.append_bits({"numeric": 0b0001, "alphanumeric": 0b0010, "byte": 0b0100}[mode], 4)
+    return result
+
+
+def get_segment_character_count(data: str, mode: str, version: int) -> BitBuffer:
+    result = BitBuffer()
+    result.append_bits(get_character_count(data, mode), get_segment_character_bits_length(mode, version))
+    return result
+
+
+def get_segment_terminator(segment_length: int, version: int, ecl: str) -> BitBuffer:
+    """Returns up to four zero bits, as many as fit in the data capacity after a segment of the given length."""
+    result = BitBuffer()
+    total_capacity_bits = get_total_data_capacity_bytes(ecl, version) * 8
+    result.append_bits(0, min(4, total_capacity_bits - segment_length))
+    return result
+
+
+def combine_segments(segments: List[BitBuffer]) -> BitBuffer:
+    result = BitBuffer()
+    for segment in segments:
+        result.extend(segment)
+    return result
+
+
+def get_optimal_segments(data: str, version: int) -> List[Segment]:
+    """Splits data into (mode, text) segments with the smallest total bit length at the character count widths
+    of the given version. Dynamic programming over the characters keeps, for every mode, the cheapest encoding
+    of the prefix that ends in that mode. Costs are in sixths of a bit, because numeric and alphanumeric
+    characters take 10/3 and 11/2 bits, and switching modes first rounds up to whole bits."""
+    if not data:
+        return [(get_best_mode(data), data)]
+
+    header_costs = [(4 + get_segment_character_bits_length(mode, version)) * 6 for mode in SEGMENT_MODES]
+    costs = header_costs[:]
+    char_modes: List[List[int]] = []  # char_modes[i][m]: mode of character i in the cheapest prefix ending in m
+    for char in data:
+        if ord(char) >= 256:  # ISO-8859-1 characters
+            raise ValueError("Mode not supported")
+        char_costs = [INFINITE_COST, INFINITE_COST, costs[2] + len(char.encode("utf-8")) * 8 * 6]
+        modes = [-1, -1, 2]
+        if char in NUMERIC_CHARSET:
+            char_costs[0], modes[0] = costs[0] + 20, 0
+        if char in ALPHANUMERIC_CHARSET:
+            char_costs[1], modes[1] = costs[1] + 33, 1
+
+        # Start a new segment after this character to switch modes.
+        for to_mode in range(len(SEGMENT_MODES)):
+            for from_mode in range(len(SEGMENT_MODES)):
+                switch_cost = -(-char_costs[from_mode] // 6) * 6 + header_costs[to_mode]
+                if modes[from_mode] != -1 and switch_cost < char_costs[to_mode]:
+                    char_costs[to_mode], modes[to_mode] = switch_cost, modes[from_mode]
+        char_modes.append(modes)
+        costs = char_costs
+
+    # Walk back from the cheapest final mode to recover the mode of every character.
+    current_mode = costs.index(min(costs))
+    data_modes = []
+    for modes in reversed(char_modes):
+        current_mode = modes[current_mode]
+        data_modes.append(current_mode)
+    data_modes.reverse()
+
+    result: List[Segment] = []
+    start = 0
+    for end in range(1, len(data) + 1):
+        if end == len(data) or data_modes[end] != data_modes[start]:
+            result.append((SEGMENT_MODES[data_modes[start]], data[start:end]))
+            start = end
     return result
 
 
-def get_segment_terminator(data_segment: str, mode_segment: str, chr_count_segment: str) -> str:
-    total_bits = len(data_segment) + len(mode_segment) + len(chr_count_segment)
-    if total_bits % 8 == 4:
-        return "0000"
-    return ""
+def get_segments_bits_length(segments: List[Segment], version: int) -> int:
+    return sum(
+        4 + get_segment_character_bits_length(mode, version) + get_segment_data_bits_length(text, mode)
+        for mode, text in segments
+    )
+
 
+def check_max_version(max_version: int) -> None:
+    """Raises a ValueError unless max_version is a version from 1 to 40."""
+    if not 1 <= max_version <= 40:
+        raise ValueError("max_version must be from 1 to 40")
 
-def combine_segments(segments: list[str]):
-    return "".join(segments)
 
+def _bisect_version(bits: int, mode: str, ecl: str, max_version: int) -> int:
+    """Returns the smallest version that fits a single segment of the given mode with bits bits of data and
+    headers, or max_version + 1 if none up to max_version does."""
+    return bisect_left(get_segment_capacity_bits_table(mode, ecl), bits, hi=max_version) + 1
+
+
+def get_version_for_length(length: int, mode: str, ecl: str, header_bits: int = 0, max_version: int = 40) -> int:
+    """Returns the smallest version that fits a single segment of length characters, or bytes in byte mode,
+    after header_bits bits of headers. The version is bisected from the capacity table without building bits."""
+    check_max_version(max_version)
+    version = _bisect_version(header_bits + get_data_bits_length(length, mode), mode, ecl, max_version)
+    if version > max_version:
+        raise ValueError("Data too long")
+    return version
+
+
+def get_best_segmentation(
+    data: str, ecl: str, header_bits: int = 0, max_version: int = 40
+) -> Tuple[int, List[Segment]]:
+    """Returns the smallest version up to max_version that fits data, after header_bits bits of headers, and
+    the segments to encode it with. The character count widths only change between version ranges, so the
+    optimal segmentation is computed once per range.
+
+    A single segment in the best mode is kept whenever it fits the same version as the optimal segments, and
+    always for non-ASCII data: decoders guess the character set of UTF-8 bytes, which some of them only do
+    when the bytes are the whole symbol."""
+    check_max_version(max_version)
+    mode = get_best_mode(data)
+    single_segment = [(mode, data)]
+    try:
+        single_version: Optional[int] = get_version_for_length(
+            get_character_count(data, mode), mode, ecl, header_bits=header_bits, max_version=max_version
+        )
+    except ValueError:  # Data too long, but the optimal segments may still fit
+        single_version = None
 
-def get_best_version(data_segment: str, mode: str, ecl: str) -> int:
-    total_mode_bits = 4
-    bits_required = len(data_segment) + total_mode_bits
+    # Only a version below the single segment one is worth the segmentation, which cannot improve on numeric.
+    if mode != "numeric" and data.isascii() and SPLITTABLE_REGEXES[mode].search(data):
+        capacity_bits = get_data_capacity_bits_table(ecl)
+        for first_version, last_version in VERSION_RANGES:
+            last_version = min(last_version, max_version if single_version is None else single_version - 1)
+            if first_version > last_version:
+                break
+            segments = get_optimal_segments(data, last_version)
+            bits_required = header_bits + get_segments_bits_length(segments, last_version)
+            version = bisect_left(capacity_bits, bits_required, lo=first_version - 1, hi=last_version) + 1
+            if version <= last_version:
+                return version, segments
 
-    for version in range(1, 41):
-        total_capacity_bits = get_total_data_capacity_bytes(ecl, version) * 8
-        segment_character_bits_length = get_segment_character_bits_length(mode, version)
-        bits_required_total = bits_required + segment_character_bits_length
+    if single_version is None:
+        raise ValueError("Data too long")
+    return single_version, single_segment
 
-        if bits_required_total <= total_capacity_bits:
-            return version
-    raise ValueError("Data too long")
 
+def get_boosted_ecl(data: str, ecl: str, header_bits: int = 0, max_version: int = 40) -> str:
+    """Returns the highest error correction level, from ecl up, at which data still fits the version it takes
+    at ecl, so that the stronger code comes at no extra size."""
+    version, segments = get_best_segmentation(data, ecl, header_bits=header_bits, max_version=max_version)
+    bits_required = header_bits + get_segments_bits_length(segments, version)
+    for stronger_ecl in reversed(ERROR_CORRECTION_LEVELS[ERROR_CORRECTION_LEVELS.index(ecl) + 1 :]):
+        if bits_required <= get_data_capacity_bits_table(stronger_ecl)[version - 1]:
+            return stronger_ecl
+    return ecl
 
-def add_padding(data: str, version: int, ecl: str) -> str:
+
+def get_best_version(data_segment: BitBuffer, mode: str, ecl: str) -> int:
+    """Returns the smallest version that fits data_segment as a single segment of the given mode."""
+    version = _bisect_version(len(data_segment), mode, ecl, max_version=40)
+    if version > 40:
+        raise ValueError("Data too long")
+    return version
+
+
+def add_padding(data: BitBuffer, version: int, ecl: str) -> BitBuffer:
     """Add padding to data segment.
 
     Args:
-        data (str): data segment
+        data (BitBuffer): data segment
 
     Returns:
-        str: padded data segment
+        BitBuffer: padded data segment
     """
-    data_length = len(data)
-    bit_padding_required = (8 - (data_length % 8)) % 8
-    data = data + "0" * bit_padding_required
+    result = BitBuffer()
+    result.extend(data)
+    bit_padding_required = (8 - (len(result) % 8)) % 8
+    result.append_bits(0, bit_padding_required)
 
     total_num_of_codewords: int = get_num_raw_data_modules(version) // 8
     num_of_blocks = NUM_ERROR_CORRECTION_BLOCKS[ecl][version]
     blockecclen: int = ECC_CODEWORDS_PER_BLOCK[ecl][version]
 
     total_data_capacity = total_num_of_codewords - (blockecclen * num_of_blocks)
-    redundant_bytes_required = ((total_data_capacity * 8) - len(data)) // 8
+    redundant_bytes_required = ((total_data_capacity * 8) - len(result)) // 8
+
+    padding_bytes = bytes([0b11101100, 0b00010001]) * (redundant_bytes_required // 2 + 1)
+    result.append_bytes(padding_bytes[:redundant_bytes_required])
+    return result
 
-    padding_bytes = itertools.cycle(["11101100", "00010001"])
-    for _ in range(redundant_bytes_required):
-        data += next(padding_bytes)
-    return data
 
+def get_data_codewords(
+    data: str, ecl: str, header: Optional[BitBuffer] = None, max_version: int = 40
+) -> Tuple[int, bytes]:
+    """Returns the version and the padded data codewords of data, before error correction. header, such as a
+    Structured Append header, is put in front of the data segments."""
+    header = header or BitBuffer()
+    version, segments = get_best_segmentation(data, ecl, header_bits=len(header), max_version=max_version)
+    segment = combine_segments(
+        [header]
+        + [
+            combine_segments(
+                [
+                    get_segment_mode(mode),
+                    get_segment_character_count(text, mode, version),
+                    get_segment_data(text, mode),
+                ]
+            )
+            for mode, text in segments
+        ]
+    )
+    terminator_segment = get_segment_terminator(len(segment), version, ecl)
+    segment = combine_segments([segment, terminator_segment])
+    segment_with_padding = add_padding(segment, version, ecl)
+    return version, segment_with_padding.to_bytes()
 
-def encode(data: str, ecl: str):
+
+def encode(data: str, ecl: str) -> Tuple[int, bytes]:
     """Create a QR code from data.
 
     Args:
         data (str): data to encode
+
+    Returns:
+        Tuple[int, bytes]: version and the final codewords, with error correction, in placement order
     """
-    mode = get_best_mode(data)
-    if mode != "byte":
-        raise NotImplementedError("Only byte mode supported.")
-
-    data_segment = get_segment_data(data)
-    version = get_best_version(data_segment, mode, ecl)
-    mode_segment = get_segment_mode(mode)
-    chr_count_segment = get_segment_character_count(data_segment, mode, version)
-    terminator_segment = get_segment_terminator(data_segment, mode_segment, chr_count_segment)
-    segment = combine_segments([mode_segment, chr_count_segment, data_segment, terminator_segment])
-    segment_with_padding = add_padding(segment, version, ecl)
-    data_to_encode = bits_to_bytearray(segment_with_padding)
-    encoded_data = add_ecc_and_interleave(version=version, ecl=ecl, data=data_to_encode)
-    all_bits = bytearray_to_bits(encoded_data)
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+    version, data_codewords = get_data_codewords(data, ecl)
+    if tracer:
+        start = record(tracer, "encode", start, version=version, ecl=ecl, data_codewords=len(data_codewords))
+    encoded_data = add_ecc_and_interleave(version=version, ecl=ecl, data=bytearray(data_codewords))
+    if tracer:
+        record(tracer, "error_correction", start, version=version, ecl=ecl, codewords=len(encoded_data))
 
-    return version, all_bits
+    return version, bytes(encoded_data)
@@ -1,12 +1,45 @@
-from typing import List
+from functools import lru_cache
+from typing import Tuple
+
+import numpy as np
+from numpy.typing import NDArray
 
 from qpyr._lib.static import ECC_CODEWORDS_PER_BLOCK, NUM_ERROR_CORRECTION_BLOCKS
 from qpyr._lib.utils import get_num_raw_data_modules
 
 
+@lru_cache(maxsize=None)
+def _get_gf_tables() -> Tuple[bytes, bytes]:
+    """Returns the antilog (exponent) and log tables of GF(2^8/0x11D) with generator 0x02. The antilog table
+    has 510 entries so that the sum of two logs can be looked up without reducing it modulo 255."""
+    exp_table = bytearray(510)
+    log_table = bytearray(256)
+    x: int = 1
+    for i in range(255):
+        exp_table[i] = x
+        exp_table[i + 255] = x
+        log_table[x] = i
+        x <<= 1
+        if x & 0x100:
+            x ^= 0x11D
+    return bytes(exp_table), bytes(log_table)
+
+
+def _reed_solomon_multiply(x: int, y: int) -> int:
+    """Returns the product of the two given field elements modulo GF(2^8/0x11D). The arguments and result
+    are unsigned 8-bit integers."""
+    if (x >> 8 != 0) or (y >> 8 != 0):
+        raise ValueError("Byte out of range")
+    if x == 0 or y == 0:
+        return 0
+    exp_table, log_table = _get_gf_tables()
+    return exp_table[log_table[x] + log_table[y]]
+
+
+@lru_cache(maxsize=None)
 def _reed_solomon_compute_divisor(degree: int) -> bytes:
-    """Returns a Reed-Solomon ECC generator polynomial for the given degree. This could be
-    implemented as a lookup table over all possible parameter values, instead of as an algorithm."""
+    """Returns a Reed-Solomon ECC generator polynomial for the given degree. Only a handful of degrees occur
+    across all versions and error correction levels, so the result is memoized per degree."""
     if not (1 <= degree <= 255):
         raise ValueError("Degree out of range")
     # Polynomial coefficients are stored from highest to lowest power, excluding the leading term which is always 1.
@@ -17,70 +50,93 @@ def _reed_solomon_compute_divisor(degree: int) -> bytes:
     # and drop the highest monomial term which is always 1x^degree.
     # Note that r = 0x02, which is a generator element of this field GF(2^8/0x11D).
     root: int = 1
-    for _ in range(degree):  # Unused variable i
+    for _ in range(degree):
         # Multiply the current product by (x - r^i)
         for j in range(degree):
             result[j] = _reed_solomon_multiply(result[j], root)
             if j + 1 < degree:
                 result[j] ^= result[j + 1]
         root = _reed_solomon_multiply(root, 0x02)
-    return result
+    return bytes(result)
 
 
-def _reed_solomon_compute_remainder(data: bytes, divisor: bytes) -> bytes:
-    """Returns the Reed-Solomon error correction codeword for the given data and divisor polynomials."""
-    result = bytearray([0] * len(divisor))
-    for b in data:  # Polynomial division
-        factor: int = b ^ result.pop(0)
-        result.append(0)
-        for i, coef in enumerate(divisor):
-            result[i] ^= _reed_solomon_multiply(coef, factor)
+@lru_cache(maxsize=None)
+def _reed_solomon_divisor_table(divisor: bytes) -> NDArray[np.uint8]:
+    """Returns a (256, len(divisor)) uint8 table whose row f holds the divisor polynomial multiplied by the
+    field element f, so one step of the polynomial division is a single row lookup and XOR."""
+    coefficients = np.frombuffer(divisor, dtype=np.uint8)
+    exp_bytes, log_bytes = _get_gf_tables()
+    exp_table = np.frombuffer(exp_bytes, dtype=np.uint8)
+    log_table = np.frombuffer(log_bytes, dtype=np.uint8).astype(np.intp)
+
+    table = np.zeros((256, len(divisor)), dtype=np.uint8)
+    nonzero = coefficients != 0
+    table[1:, nonzero] = exp_table[log_table[1:, np.newaxis] + log_table[coefficients[nonzero]]]
+    table.flags.writeable = False
+    return table
+
+
+def _reed_solomon_compute_remainders(data: NDArray[np.uint8], divisor: bytes) -> NDArray[np.uint8]:
+    """Returns the Reed-Solomon error correction codewords for every row of the given (blocks, length) data
+    array. All rows are divided at once, one column per step."""
+    table = _reed_solomon_divisor_table(bytes(divisor))
+    result = np.zeros((data.shape[0], len(divisor)), dtype=np.uint8)
+    for column in data.T:  # Polynomial division
+        factor = column ^ result[:, 0]
+        result[:, :-1] = result[:, 1:]
+        result[:, -1] = 0
+        result ^= table[factor]
     return result
 
 
-def _reed_solomon_multiply(x: int, y: int) -> int:
-    """Returns the product of the two given field elements modulo GF(2^8/0x11D). The arguments and result
-    are unsigned 8-bit integers. This could be implemented as a lookup table of 256*256 entries of uint8."""
-    if (x >> 8 != 0) or (y >> 8 != 0):
-        raise ValueError("Byte out of range")
-    # Russian peasant multiplication
-    z: int = 0
-    for i in reversed(range(8)):
-        z = (z << 1) ^ ((z >> 7) * 0x11D)
-        z ^= ((y >> i) & 1) * x
-    assert z >> 8 == 0
-    return z
+def _reed_solomon_compute_remainder(data: bytes, divisor: bytes) -> bytes:
+    """Returns the Reed-Solomon error correction codeword for the given data and divisor polynomials."""
+    rows = np.frombuffer(bytes(data), dtype=np.uint8).reshape(1, -1)
+    return bytearray(_reed_solomon_compute_remainders(rows, divisor)[0].tobytes())
 
 
-def add_ecc_and_interleave(version: int, ecl: str, data: bytearray) -> bytearray:
-    """Returns a new byte string representing the given data with the appropriate error correction
-    codewords appended to it, based on this object's version and error correction level."""
+def add_ecc_and_interleave_stack(version: int, ecl: str, data: NDArray[np.uint8]) -> NDArray[np.uint8]:
+    """Returns a (k, raw codewords) array holding every row of the (k, data codewords) data array with the
+    appropriate error correction codewords appended and interleaved. The ECC of every block of every row is
+    computed at once."""
     # Calculate parameter numbers
     numblocks: int = NUM_ERROR_CORRECTION_BLOCKS[ecl][version]
     blockecclen: int = ECC_CODEWORDS_PER_BLOCK[ecl][version]
     rawcodewords: int = get_num_raw_data_modules(version) // 8
     numshortblocks: int = numblocks - rawcodewords % numblocks
     shortblocklen: int = rawcodewords // numblocks
+    shortdatalen: int = shortblocklen - blockecclen
+    numlongblocks: int = numblocks - numshortblocks
 
-    # Split data into blocks and append ECC to each block
-    blocks: List[bytes] = []
+    # Split data into blocks, short blocks first, and compute the ECC of all blocks of equal length at once
+    assert data.shape[1] == numshortblocks * shortdatalen + numlongblocks * (shortdatalen + 1)
+    rows = len(data)
     rsdiv: bytes = _reed_solomon_compute_divisor(blockecclen)
-    k: int = 0
-    for i in range(numblocks):
-        dat: bytearray = data[k : k + shortblocklen - blockecclen + (0 if i < numshortblocks else 1)]
-        k += len(dat)
-        ecc: bytes = _reed_solomon_compute_remainder(dat, rsdiv)
-        if i < numshortblocks:
-            dat.append(0)
-        blocks.append(dat + ecc)
-    assert k == len(data)
-
-    # Interleave (not concatenate) the bytes from every block into a single sequence
-    result = bytearray()
-    for i in range(len(blocks[0])):
-        for j, blk in enumerate(blocks):
-            # Skip the padding byte in short blocks
-            if (i != shortblocklen - blockecclen) or (j >= numshortblocks):
-                result.append(blk[i])
-    assert len(result) == rawcodewords
+    short_blocks = data[:, : numshortblocks * shortdatalen].reshape(rows, numshortblocks, shortdatalen)
+    long_blocks = data[:, numshortblocks * shortdatalen :].reshape(rows, numlongblocks, shortdatalen + 1)
+    short_ecc = _reed_solomon_compute_remainders(short_blocks.reshape(-1, shortdatalen), rsdiv)
+    long_ecc = _reed_solomon_compute_remainders(long_blocks.reshape(-1, shortdatalen + 1), rsdiv)
+    ecc = np.concatenate(
+        (short_ecc.reshape(rows, numshortblocks, blockecclen), long_ecc.reshape(rows, numlongblocks, blockecclen)),
+        axis=1,
+    )
+
+    # Interleave (not concatenate) the bytes from every block into a single sequence. Short blocks have no byte
+    # at the last data column, so that column only takes bytes from the long blocks.
+    data_columns = np.concatenate((short_blocks, long_blocks[:, :, :shortdatalen]), axis=1).transpose(0, 2, 1)
+    result = np.hstack(
+        (
+            data_columns.reshape(rows, -1),
+            long_blocks[:, :, shortdatalen],
+            ecc.transpose(0, 2, 1).reshape(rows, -1),
+        )
+    )
+    assert result.shape[1] == rawcodewords
     return result
+
+
+def add_ecc_and_interleave(version: int, ecl: str, data: bytearray) -> bytearray:
+    """Returns a new byte string representing the given data with the appropriate error correction
+    codewords appended to it, based on this object's version and error correction level."""
+    rows = np.frombuffer(bytes(data), dtype=np.uint8).reshape(1, -1)
+    return bytearray(add_ecc_and_interleave_stack(version, ecl, rows)[0].tobytes())
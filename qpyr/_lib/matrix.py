@@ -1,22 +1,24 @@
-from typing import Callable, Dict, List, Optional, Tuple
+import numbers
+import time
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple, Union
 
 import numpy as np
 from numpy.typing import NDArray
 
 
-from qpyr._lib.data_masking import (
-    get_adjacent_modules_penalty,
-    get_finder_pattern_penalty,
-    get_masks,
-    get_proportion_penalty,
-    get_same_color_block_penalty,
-)
+from qpyr._lib.data_masking import get_estimated_penalty_scores, get_masks, get_penalty_scores
 from qpyr._lib.static import ColorValue
+from qpyr._lib.tracing import get_tracer, record
 from qpyr._lib.utils import get_grid_size
 
 
 CoordinateValueMap = Dict[Tuple[int, int], int]
 
+# A fixed mask reference from 0 to 7, "exhaustive" to score all 8 masks exactly, or "fast" to pick the mask with
+# the lowest estimated penalty.
+MaskOption = Union[int, str]
+
 
 def get_timing_pattern(grid_size: int = 21) -> CoordinateValueMap:
     fixed_row, fixed_col = 6, 6
@@ -58,15 +60,9 @@ def get_finder_and_seperator(grid_size) -> CoordinateValueMap:
 
 
 def add_quiet_zone(grid, border: int = 4):
-    horizontal_zone = np.zeros((grid.shape[0], border), dtype=int)
-    grid = np.hstack((grid, horizontal_zone))
-    grid = np.hstack((horizontal_zone, grid))
-
-    vertical_zone = np.zeros((border, grid.shape[1]), dtype=int)
-    grid = np.vstack((grid, vertical_zone))
-    grid = np.vstack((vertical_zone, grid))
-
-    assert grid.dtype.name == "int64"
+    """Returns grid, or a (..., n, n) stack of grids, surrounded by border white modules."""
+    padding = [(0, 0)] * (grid.ndim - 2) + [(border, border), (border, border)]
+    grid = np.pad(grid, padding, constant_values=ColorValue.WHITE)
     return grid
 
 
@@ -105,23 +101,6 @@ def _iterate_over_grid(grid_size) -> List[Tuple[int, int]]:
     return result
 
 
-def get_codeword_placement(binary_str, grid, grid_size) -> CoordinateValueMap:
-    result = {}
-    grid_iterator = _iterate_over_grid(grid_size)
-    for row, col in grid_iterator:
-        if not binary_str:
-            # Pad with white blocks.
-            if grid[row][col] == -1:
-                result[(row, col)] = ColorValue.WHITE
-        elif grid[row][col] == -1:
-            result[(row, col)] = binary_str[0]
-            binary_str = binary_str[1:]
-        else:
-            continue
-
-    return result
-
-
 def get_format_information(ecl: str, mask_reference: int) -> int:
     generator_polynomial = 1335
     mask = 21522
@@ -148,7 +127,7 @@ def get_format_placement(grid_size, format_info: int = ColorValue.DUMMY_VALUE) -
     index = 14
     for row in range(grid_size):
         if (row <= 8) or (row >= grid_size - 8):
-            if row in (6, 13):
+            if row in (6, grid_size - 8):  # timing pattern and dark module
                 continue
             result[(row, col := 8)] = format_info_to_draw[index]
             index -= 1
@@ -165,14 +144,6 @@ def get_format_placement(grid_size, format_info: int = ColorValue.DUMMY_VALUE) -
     return result
 
 
-def apply_mask(mask: Callable, data: CoordinateValueMap) -> CoordinateValueMap:
-    result = {}
-    for coordinate, value in data.items():
-        i, j = coordinate
-        result[(i, j)] = mask(i, j) ^ int(value)  # int(value) may not be needed if value already int
-    return result
-
-
 def _get_alignment_pattern_coords(version, grid_size) -> List[int]:
     """Returns a list of row/col coordinates of center modules for alignment patterns."""
     if version == 1:
@@ -261,7 +232,18 @@ def get_version_placement(version_information: Optional[int], grid_size: int) ->
     return result
 
 
-def matrix(binary_string: str, version: int, ecl: str, quiet_zone_border: int = 4):
+class FunctionTemplate(NamedTuple):
+    grid: NDArray  # uint8 function patterns, white at data and format information modules
+    data_mask: NDArray  # True at data modules
+    format_mask: NDArray  # True at format information modules
+
+
+@lru_cache(maxsize=None)
+def get_function_template(version: int) -> FunctionTemplate:
+    """Returns the read-only function pattern template for the given version. It only depends on the version,
+    so it is built on first use and shared by every matrix of that version."""
+    if not (1 <= version <= 40):
+        raise ValueError("Version number out of range")
     grid_size = get_grid_size(version)
 
     version_information = get_version_information(version)
@@ -275,7 +257,7 @@ def matrix(binary_string: str, version: int, ecl: str, quiet_zone_border: int =
     alignment_pattern_positions = get_alignment_pattern_positions(alignment_pattern_coords)
     alignment_pattern = get_alignment_patterns(alignment_pattern_positions)
 
-    grid = np.full((grid_size, grid_size), -1, dtype=int)
+    grid = np.full((grid_size, grid_size), ColorValue.DEFAULT_VALUE, dtype=int)
 
     grid = override_grid(grid, dummy_format_information_placement)
 
@@ -284,41 +266,166 @@ def matrix(binary_string: str, version: int, ecl: str, quiet_zone_border: int =
     grid = override_grid(grid, version_information_pattern)
     grid = override_grid(grid, alignment_pattern)
 
-    codeword_placement = get_codeword_placement(binary_string, grid, grid_size)
-    grid = override_grid(grid, codeword_placement)
+    # The placeholder values only live on in the masks, so the grid itself fits in one byte per module.
+    data_mask = grid == ColorValue.DEFAULT_VALUE
+    format_mask = grid == ColorValue.DUMMY_VALUE
+    grid = np.where(data_mask | format_mask, ColorValue.WHITE, grid).astype(np.uint8)
+    for array in (grid, data_mask, format_mask):
+        array.flags.writeable = False
+    return FunctionTemplate(grid, data_mask, format_mask)
+
+
+@lru_cache(maxsize=None)
+def get_data_module_positions(version: int) -> NDArray:
+    """Returns the flat grid index of every data module in placement order, so bit i of the interleaved
+    codewords goes to grid.flat[positions[i]]. The interleaving itself does not depend on the grid, so the
+    positions only depend on the version."""
+    template = get_function_template(version)
+    grid_size = template.grid.shape[0]
+    rows, cols = np.array(_iterate_over_grid(grid_size)).T
+    flat_positions = rows * grid_size + cols
+    result = flat_positions[template.data_mask.flat[flat_positions]]
+    result.flags.writeable = False
+    return result
 
-    masks = get_masks()
-    best_mask_ref, lowest_penalty_points = (0, 100_000)  # arbitrary large number
-    for mask_reference, mask in enumerate(masks):
-        masked_codewords = apply_mask(mask, codeword_placement)
-        masked_grid = override_grid(grid, masked_codewords)
 
-        format_information = get_format_information(ecl, mask_reference)
-        format_information_placement = get_format_placement(grid_size, format_information)
-        masked_grid = override_grid(masked_grid, format_information_placement)
+def place_codewords(codewords: Sequence[bytes], grids: NDArray, version: int) -> NDArray:
+    """Writes the bits of codewords[i] into the data modules of grids[i] for a (k, n, n) stack of grids.
+    Remainder bits are left white."""
+    positions = get_data_module_positions(version)
+    bits = np.zeros((len(grids), len(positions)), dtype=grids.dtype)
+    codeword_bytes = np.frombuffer(b"".join(codewords), dtype=np.uint8).reshape(len(grids), -1)
+    codeword_bits = np.unpackbits(codeword_bytes, axis=1)
+    bits[:, : codeword_bits.shape[1]] = codeword_bits
+    grids.reshape(len(grids), -1)[:, positions] = bits
+    return grids
+
+
+@lru_cache(maxsize=None)
+def get_mask_planes(version: int) -> NDArray:
+    """Returns an (8, n, n) boolean stack of the mask patterns, indexed by mask reference and already
+    restricted to the data modules of the given version."""
+    data_mask = get_function_template(version).data_mask
+    rows, cols = np.indices(data_mask.shape)
+    result = np.stack([mask(rows, cols) for mask in get_masks()]) & data_mask
+    result.flags.writeable = False
+    return result
 
-        adjacent_modules_points = get_adjacent_modules_penalty(masked_grid)
-        same_color_block_penalty = get_same_color_block_penalty(masked_grid)
 
-        masked_grid_with_quiet_zone = add_quiet_zone(masked_grid, quiet_zone_border)
-        finder_pattern_penalty = get_finder_pattern_penalty(masked_grid_with_quiet_zone)
+@lru_cache(maxsize=None)
+def _get_format_overlay(version: int, ecl: str) -> Tuple[NDArray, NDArray]:
+    """Returns the flat grid indexes of the format information modules and an (8, len(indexes)) array of
+    their values, one row per mask reference."""
+    grid_size = get_grid_size(version)
+    placements = [get_format_placement(grid_size, get_format_information(ecl, ref)) for ref in range(8)]
+    coordinates = list(placements[0])
+    positions = np.array([row * grid_size + col for row, col in coordinates])
+    values = np.array([[placement[coordinate] for coordinate in coordinates] for placement in placements])
+    return positions, values
+
+
+def apply_masks(grid: NDArray, version: int, ecl: str, mask_references: Sequence[int] = tuple(range(8))) -> NDArray:
+    """Returns a (..., len(mask_references), n, n) stack of the (..., n, n) grid masked with every given mask
+    pattern, each with its own format information in place."""
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+    mask_references = list(mask_references)
+    result = grid[..., np.newaxis, :, :] ^ get_mask_planes(version)[mask_references]
+    if tracer:
+        start = record(tracer, "masking", start, version=version, candidates=result[..., 0, 0].size)
+    positions, values = _get_format_overlay(version, ecl)
+    result.reshape(result.shape[:-2] + (-1,))[..., positions] = values[mask_references]
+    if tracer:
+        record(tracer, "format_placement", start, version=version, ecl=ecl)
+    return result
 
-        proportion_penalty = get_proportion_penalty(masked_grid)
 
-        total_penalty_points = (
-            adjacent_modules_points + same_color_block_penalty + finder_pattern_penalty + proportion_penalty
+class MaskedMatrices(NamedTuple):
+    grids: NDArray  # (k, size, size) finished matrices, including the quiet zone
+    masks: NDArray  # (k,) mask reference of every matrix
+    scores: Optional[NDArray]  # (k,) total penalty of every matrix, estimated for "fast", None for a fixed mask
+
+
+def normalize_mask_option(mask: MaskOption) -> MaskOption:
+    """Returns mask as a plain int from 0 to 7, "fast" or "exhaustive". Any integer type is accepted, such as the
+    numpy integers reported in MaskedMatrices.masks, but bool is not."""
+    if isinstance(mask, numbers.Integral) and not isinstance(mask, bool) and 0 <= mask < 8:
+        return int(mask)
+    if isinstance(mask, str) and mask in ("fast", "exhaustive"):
+        return mask
+    raise ValueError("Mask must be a mask reference from 0 to 7, 'fast' or 'exhaustive'")
+
+
+def masked_matrices(
+    codewords: Sequence[bytes], version: int, ecl: str, quiet_zone_border: int = 4, mask: MaskOption = "exhaustive"
+) -> MaskedMatrices:
+    """Returns the finished matrices of every entry of codewords, which must all be encoded for the same version
+    and error correction level, together with the chosen masks and their penalty scores. Placement, masking and
+    mask selection run on the whole stack at once.
+
+    A fixed mask skips the penalty scoring and applies only that mask. "fast" scores the N1 and N3 penalties on
+    a sample of rows and columns, which may pick a mask with a few more penalty points than "exhaustive".
+    """
+    mask = normalize_mask_option(mask)
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+    template = get_function_template(version)
+    grids = np.repeat(template.grid[np.newaxis], len(codewords), axis=0)
+    grids = place_codewords(codewords, grids, version)
+    if tracer:
+        record(tracer, "placement", start, version=version, count=len(codewords))
+
+    if isinstance(mask, int):
+        masked_grids = apply_masks(grids, version, ecl, mask_references=[mask])[:, 0]
+        mask_refs = np.full(len(codewords), mask)
+        return MaskedMatrices(add_quiet_zone(masked_grids, quiet_zone_border), mask_refs, None)
+    get_scores = get_penalty_scores if mask == "exhaustive" else get_estimated_penalty_scores
+
+    candidates = apply_masks(grids, version, ecl)
+    start = time.perf_counter() if tracer else 0.0
+    penalty_points = get_scores(candidates, quiet_zone=quiet_zone_border).sum(axis=-1)
+    mask_refs = np.argmin(penalty_points, axis=-1)
+    if tracer:
+        # All candidates are scored at once, so the penalty of every candidate is reported instead of its time.
+        record(
+            tracer,
+            "mask_evaluation",
+            start,
+            version=version,
+            ecl=ecl,
+            strategy=mask,
+            penalties=penalty_points.tolist(),
+            masks=mask_refs.tolist(),
         )
 
-        if total_penalty_points < lowest_penalty_points:
-            best_mask_ref, lowest_penalty_points = (mask_reference, total_penalty_points)
+    masked_grids = candidates[np.arange(len(candidates)), mask_refs]
+    scores = penalty_points[np.arange(len(candidates)), mask_refs]
+    return MaskedMatrices(add_quiet_zone(masked_grids, quiet_zone_border), mask_refs, scores)
+
+
+def matrices(
+    codewords: Sequence[bytes], version: int, ecl: str, quiet_zone_border: int = 4, mask: MaskOption = "exhaustive"
+) -> NDArray:
+    """Returns a (k, size, size) stack of finished matrices, one per entry of codewords. See masked_matrices()."""
+    return masked_matrices(codewords, version, ecl, quiet_zone_border, mask).grids
+
+
+def matrix(codewords: bytes, version: int, ecl: str, quiet_zone_border: int = 4, mask: MaskOption = "exhaustive"):
+    return matrices([codewords], version, ecl, quiet_zone_border, mask)[0]
+
+
+class PackedMatrix(NamedTuple):
+    size: int  # number of modules per row and column
+    rows: NDArray  # (size, ceil(size / 8)) uint8, every row packed with np.packbits
+
 
-    best_mask = masks[best_mask_ref]
-    masked_codewords = apply_mask(best_mask, codeword_placement)
-    masked_grid = override_grid(grid, masked_codewords)
+def pack_matrix(grid: NDArray) -> PackedMatrix:
+    """Returns grid with every module packed into one bit, for storing or shipping matrices."""
+    if grid.shape[0] != grid.shape[1]:
+        raise ValueError("The input grid must be square (n x n).")
+    return PackedMatrix(grid.shape[0], np.packbits(grid == ColorValue.BLACK, axis=1))
 
-    format_information = get_format_information(ecl, best_mask_ref)
-    format_information_placement = get_format_placement(grid_size, format_information)
-    masked_grid = override_grid(masked_grid, format_information_placement)
 
-    masked_grid = add_quiet_zone(masked_grid, quiet_zone_border)
-    return masked_grid
+def unpack_matrix(packed: PackedMatrix) -> NDArray:
+    """Returns the uint8 grid of a matrix packed by pack_matrix()."""
+    return np.unpackbits(packed.rows, axis=1, count=packed.size)
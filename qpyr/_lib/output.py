@@ -0,0 +1,28 @@
+import io
+from typing import BinaryIO, Optional
+
+from numpy.typing import NDArray
+
+from qpyr._lib.png import write_png
+from qpyr._lib.vector import VECTOR_WRITERS
+
+
+def write_image(grid: NDArray, fileformat: str, out: Optional[BinaryIO] = None, cell_size: int = 20) -> Optional[bytes]:
+    """Writes grid as an image file in fileformat to the binary file-like object out, or returns the file as
+    bytes if out is None. PNG is written by write_png, SVG, EPS and PDF by the vector writers and any other
+    raster format that PIL can save by rendering the grid with draw()."""
+    fileformat = fileformat.lower()
+    if fileformat == "png":
+        return write_png(grid, out, cell_size=cell_size)
+    vector_writer = VECTOR_WRITERS.get(fileformat)
+    if vector_writer:
+        return vector_writer(grid, out, cell_size=cell_size)
+
+    from PIL import Image  # only raster formats other than PNG need Pillow
+
+    from qpyr._lib.draw import draw
+
+    target = io.BytesIO() if out is None else out
+    pil_format = Image.registered_extensions().get("." + fileformat, fileformat)
+    draw(grid, cell_size=cell_size).save(target, format=pil_format)
+    return target.getvalue() if out is None else None
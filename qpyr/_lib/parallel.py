@@ -0,0 +1,142 @@
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from qpyr._lib.batch import generate_matrices, generate_symbol_matrices
+from qpyr._lib.error_correction import _reed_solomon_compute_divisor, _reed_solomon_divisor_table
+from qpyr._lib.matrix import MaskOption, get_data_module_positions, get_function_template, get_mask_planes
+from qpyr._lib.static import ECC_CODEWORDS_PER_BLOCK
+
+# Chunks are kept small enough that every worker gets several of them, and large enough to amortize the
+# per-task overhead and fill the per-version stacks.
+CHUNKS_PER_WORKER = 4
+MAX_CHUNK_SIZE = 1024
+
+# (shared memory name, dtype, grid size of every matrix in the chunk)
+ChunkResult = Tuple[str, str, List[int]]
+
+
+def preload_tables() -> None:
+    """Builds the per-version function pattern, placement and mask tables and the Reed-Solomon tables."""
+    for version in range(1, 41):
+        get_function_template(version)
+        get_data_module_positions(version)
+        get_mask_planes(version)
+    for degree in {degree for degrees in ECC_CODEWORDS_PER_BLOCK.values() for degree in degrees[1:]}:
+        _reed_solomon_divisor_table(_reed_solomon_compute_divisor(degree))
+
+
+def get_chunk_size(num_payloads: int, workers: int) -> int:
+    return max(1, min(MAX_CHUNK_SIZE, math.ceil(num_payloads / (workers * CHUNKS_PER_WORKER))))
+
+
+# generate_matrices() or generate_symbol_matrices(), called in the workers with
+# (items, ecl, quiet_zone_border, mask).
+ChunkGenerator = Callable[[Sequence[Any], str, int, MaskOption], List[NDArray]]
+
+
+def _generate_chunk(
+    generate: ChunkGenerator, items: Sequence[Any], ecl: str, quiet_zone_border: int, mask: MaskOption
+) -> ChunkResult:
+    """Runs in a worker: generates the matrices of one chunk and copies them, back to back, into a new shared
+    memory block that the parent process reads and unlinks."""
+    qr_matrices = generate(items, ecl, quiet_zone_border, mask)
+    dtype = qr_matrices[0].dtype
+    sizes = [len(qr_matrix) for qr_matrix in qr_matrices]
+    block = shared_memory.SharedMemory(create=True, size=sum(size * size for size in sizes) * dtype.itemsize)
+    try:
+        buffer = np.ndarray((sum(size * size for size in sizes),), dtype=dtype, buffer=block.buf)
+        offset = 0
+        for qr_matrix in qr_matrices:
+            buffer[offset : offset + qr_matrix.size] = qr_matrix.ravel()
+            offset += qr_matrix.size
+        del buffer
+    finally:
+        block.close()
+    return block.name, dtype.str, sizes
+
+
+def _read_chunk(result: ChunkResult) -> List[NDArray]:
+    name, dtype, sizes = result
+    block = shared_memory.SharedMemory(name=name)
+    try:
+        buffer = np.ndarray((sum(size * size for size in sizes),), dtype=dtype, buffer=block.buf)
+        qr_matrices = []
+        offset = 0
+        for size in sizes:
+            qr_matrices.append(buffer[offset : offset + size * size].reshape(size, size).copy())
+            offset += size * size
+        del buffer
+    finally:
+        block.close()
+        block.unlink()
+    return qr_matrices
+
+
+def _generate_parallel(
+    generate: ChunkGenerator,
+    items: List[Any],
+    ecl: str,
+    workers: Optional[int],
+    chunksize: Optional[int],
+    quiet_zone_border: int,
+    mask: MaskOption,
+) -> List[NDArray]:
+    if not items:
+        return []
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or get_chunk_size(len(items), workers)
+    chunks = [items[start : start + chunksize] for start in range(0, len(items), chunksize)]
+
+    # Forked workers inherit the warm tables, and sharing one resource tracker with the workers keeps it from
+    # unlinking result blocks when a worker exits.
+    preload_tables()
+    resource_tracker.ensure_running()
+
+    result: List[NDArray] = []
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=preload_tables) as executor:
+        futures = [executor.submit(_generate_chunk, generate, chunk, ecl, quiet_zone_border, mask) for chunk in chunks]
+        for index, future in enumerate(futures):
+            try:
+                chunk_result = future.result()
+            except BaseException:
+                # Release the result blocks of later chunks that finish anyway before reporting the error.
+                for pending in futures[index + 1 :]:
+                    if not pending.cancel() and pending.exception() is None:
+                        _read_chunk(pending.result())
+                raise
+            result.extend(_read_chunk(chunk_result))
+    return result
+
+
+def generate_matrices_parallel(
+    data: Iterable[str],
+    ecl: str,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    quiet_zone_border: int = 4,
+    mask: MaskOption = "exhaustive",
+) -> List[NDArray]:
+    """Returns the matrix of every payload, in input order, generated by a pool of worker processes.
+
+    Payloads are sharded into chunks, every chunk goes through generate_matrices() in a worker, and the
+    finished matrices come back through shared memory instead of being pickled.
+    """
+    return _generate_parallel(generate_matrices, list(data), ecl, workers, chunksize, quiet_zone_border, mask)
+
+
+def generate_symbol_matrices_parallel(
+    symbols: Iterable[Tuple[int, bytes]],
+    ecl: str,
+    workers: Optional[int] = None,
+    chunksize: Optional[int] = None,
+    quiet_zone_border: int = 4,
+    mask: MaskOption = "exhaustive",
+) -> List[NDArray]:
+    """Same as generate_matrices_parallel() for already encoded (version, data codewords) symbols."""
+    return _generate_parallel(generate_symbol_matrices, list(symbols), ecl, workers, chunksize, quiet_zone_border, mask)
@@ -0,0 +1,67 @@
+import struct
+import time
+import zlib
+from typing import BinaryIO, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from qpyr._lib.static import ColorValue
+from qpyr._lib.tracing import get_tracer, record
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+# Scanline filter types. Up stores the difference to the previous scanline, which is all zero for every copy of
+# a module row, so the copies cost almost nothing to compress.
+FILTER_NONE = 0
+FILTER_UP = 2
+
+
+def _chunk(chunk_type: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + chunk_type + data + struct.pack(">I", zlib.crc32(chunk_type + data))
+
+
+def get_scanlines(grid: NDArray, cell_size: int = 20, quiet_zone: int = 0) -> bytes:
+    """Returns the filtered bit depth 1 scanlines of grid, with quiet_zone light modules added on every side.
+    Every module row is packed once and then repeated cell_size times with the Up filter."""
+    light = np.pad(grid != ColorValue.BLACK, quiet_zone, constant_values=True)
+    packed = np.packbits(np.repeat(light, cell_size, axis=1), axis=1)
+    scanlines = np.zeros((packed.shape[0], cell_size, packed.shape[1] + 1), dtype=np.uint8)
+    scanlines[:, 0, 0] = FILTER_NONE
+    scanlines[:, 0, 1:] = packed
+    scanlines[:, 1:, 0] = FILTER_UP
+    return scanlines.tobytes()
+
+
+def write_png(
+    grid: NDArray,
+    out: Optional[BinaryIO] = None,
+    cell_size: int = 20,
+    quiet_zone: int = 0,
+    compression_level: int = 6,
+) -> Optional[bytes]:
+    """Writes grid as a 1-bit grayscale PNG image to the binary file-like object out, or returns the PNG file as
+    bytes if out is None. cell_size is the size of one module in pixels and quiet_zone the number of light
+    modules added on every side, on top of any quiet zone that grid already has. compression_level is passed to
+    zlib: 1 is about twice as fast, 9 gives slightly smaller files for several times the CPU."""
+    if grid.shape[0] != grid.shape[1]:
+        raise ValueError("The input grid must be square (n x n).")
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+
+    size = (grid.shape[0] + 2 * quiet_zone) * cell_size
+    header = struct.pack(">IIBBBBB", size, size, 1, 0, 0, 0, 0)  # bit depth 1, grayscale, no interlace
+    result = b"".join(
+        [
+            PNG_SIGNATURE,
+            _chunk(b"IHDR", header),
+            _chunk(b"IDAT", zlib.compress(get_scanlines(grid, cell_size, quiet_zone), compression_level)),
+            _chunk(b"IEND", b""),
+        ]
+    )
+    if tracer:
+        record(tracer, "png_output", start, size=(size, size), bytes=len(result))
+    if out is None:
+        return result
+    out.write(result)
+    return None
@@ -8,6 +8,12 @@ class ColorValue:
     DUMMY_VALUE = -2
 
 
+ALPHANUMERIC_CHARSET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ $%*+-./:"
+
+# In order of increasing error correction.
+ERROR_CORRECTION_LEVELS = ("L", "M", "Q", "H")
+
+
 # fmt: off
 
 TOTAL_NUMBER_OF_CODEWORDS: Sequence[int] = (
@@ -0,0 +1,108 @@
+import os
+from itertools import islice
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+from numpy.typing import NDArray
+
+from qpyr._lib.batch import bucket_by_version, generate_bucket
+from qpyr._lib.matrix import MaskOption
+from qpyr._lib.output import write_image
+
+# Payloads generated together as stacks. Only this many payloads and their matrices are held at a time.
+DEFAULT_WINDOW = 256
+
+# Called with the index, the payload and the matrix of every QR code. Its return value becomes the result.
+Sink = Callable[[int, str, NDArray], Any]
+
+
+class StreamItem(NamedTuple):
+    index: int  # position of the payload in the input
+    payload: str
+    result: Any  # return value of the sink, or the matrix without a sink; None if error is set
+    error: Optional[ValueError]  # e.g. "Data too long", in which case the sink was not called
+
+
+class DirectorySink:
+    """Writes every QR code as an image file in fileformat to directory, named after its index, and returns
+    the path of the file."""
+
+    def __init__(self, directory: str, fileformat: str = "png", cell_size: int = 20):
+        self.directory = directory
+        self.fileformat = fileformat.lower()
+        self.cell_size = cell_size
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, index: int, payload: str) -> str:
+        return os.path.join(self.directory, f"{index}.{self.fileformat}")
+
+    def __call__(self, index: int, payload: str, grid: NDArray) -> str:
+        path = self.get_path(index, payload)
+        with open(path, "wb") as fp:
+            write_image(grid, self.fileformat, fp, cell_size=self.cell_size)
+        return path
+
+
+class FileSink:
+    """Writes every QR code as an image file in fileformat to the binary file-like object out, one after the
+    other, and returns the (offset, length) of the image in out."""
+
+    def __init__(self, out: BinaryIO, fileformat: str = "png", cell_size: int = 20):
+        self.out = out
+        self.fileformat = fileformat.lower()
+        self.cell_size = cell_size
+        self.offset = 0
+
+    def __call__(self, index: int, payload: str, grid: NDArray) -> Tuple[int, int]:
+        image: bytes = write_image(grid, self.fileformat, cell_size=self.cell_size)  # type: ignore
+        self.out.write(image)
+        offset, self.offset = self.offset, self.offset + len(image)
+        return offset, len(image)
+
+
+def _generate_window(
+    payloads: List[str], ecl: str, quiet_zone_border: int, mask: MaskOption
+) -> List[Union[NDArray, ValueError]]:
+    """Returns the matrix of every payload, or the error that prevented encoding it, in input order."""
+    errors: Dict[str, ValueError] = {}
+    buckets = bucket_by_version(payloads, ecl, errors)
+    outcomes: Dict[str, Union[NDArray, ValueError]] = dict(errors)
+    for version, items in buckets.items():
+        stack = generate_bucket(version, ecl, [codewords for _, codewords in items], quiet_zone_border, mask)
+        outcomes.update(zip([payload for payload, _ in items], stack))
+    return [outcomes[payload] for payload in payloads]
+
+
+def stream_matrices(
+    data: Iterable[str],
+    ecl: str = "M",
+    sink: Optional[Sink] = None,
+    window: int = DEFAULT_WINDOW,
+    quiet_zone_border: int = 4,
+    mask: MaskOption = "exhaustive",
+) -> Iterator[StreamItem]:
+    """Lazily yields a StreamItem for every payload of data, in input order.
+
+    data is consumed window payloads at a time, and every window is generated as stacks like
+    generate_matrices(), so memory stays bounded by the window however long data is. Every matrix is passed to
+    sink, e.g. a DirectorySink or a FileSink, as its item is yielded. Payloads that cannot be encoded are
+    yielded with their error instead of ending the stream.
+    """
+    if window < 1:
+        raise ValueError("window must be at least 1")
+    return _stream(iter(data), ecl, sink, window, quiet_zone_border, mask)
+
+
+def _stream(
+    iterator: Iterator[str], ecl: str, sink: Optional[Sink], window: int, quiet_zone_border: int, mask: MaskOption
+) -> Iterator[StreamItem]:
+    index = 0
+    while True:
+        payloads = list(islice(iterator, window))
+        if not payloads:
+            return
+        for payload, outcome in zip(payloads, _generate_window(payloads, ecl, quiet_zone_border, mask)):
+            if isinstance(outcome, ValueError):
+                yield StreamItem(index, payload, None, outcome)
+            else:
+                yield StreamItem(index, payload, outcome if sink is None else sink(index, payload, outcome), None)
+            index += 1
@@ -0,0 +1,97 @@
+from typing import List, Optional, Tuple
+
+from numpy.typing import NDArray
+
+from qpyr._lib.batch import generate_symbol_matrices
+from qpyr._lib.encode import check_max_version, get_best_segmentation, get_data_codewords
+from qpyr._lib.matrix import MaskOption
+from qpyr._lib.utils import BitBuffer
+
+MAX_SYMBOLS = 16
+
+# Mode indicator, symbol position, total number of symbols and parity.
+HEADER_BITS = 4 + 4 + 4 + 8
+
+
+def get_parity(data: str) -> int:
+    """Returns the XOR of every byte of data, which every symbol of the sequence carries in its header."""
+    parity = 0
+    for byte in data.encode("utf-8"):
+        parity ^= byte
+    return parity
+
+
+def get_structured_append_header(index: int, total: int, parity: int) -> BitBuffer:
+    """Returns the header of the symbol at position index, counting from 0, of a sequence of total symbols."""
+    if not 0 <= index < total <= MAX_SYMBOLS:
+        raise ValueError("Invalid symbol position")
+    result = BitBuffer()
+    result.append_bits(0b0011, 4)
+    result.append_bits(index, 4)
+    result.append_bits(total - 1, 4)
+    result.append_bits(parity, 8)
+    return result
+
+
+def _fits(data: str, ecl: str, max_version: int) -> bool:
+    try:
+        get_best_segmentation(data, ecl, header_bits=HEADER_BITS, max_version=max_version)
+    except ValueError:
+        return False
+    return True
+
+
+def split_payload(data: str, ecl: str, max_version: int = 40) -> List[str]:
+    """Splits data into as few parts as possible that each fit a symbol of at most max_version, header
+    included. Every part is the longest prefix of the rest that fits, found by bisection."""
+    check_max_version(max_version)
+    result: List[str] = []
+    start = 0
+    while start < len(data) or not result:
+        if len(result) == MAX_SYMBOLS:
+            raise ValueError("Data too long")
+        low, high = start, len(data)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if _fits(data[start:middle], ecl, max_version):
+                low = middle
+            else:
+                high = middle - 1
+        if low == start and start < len(data):
+            raise ValueError("Data too long")
+        result.append(data[start:low])
+        start = low
+    return result
+
+
+def get_structured_append_codewords(data: str, ecl: str, max_version: int = 40) -> List[Tuple[int, bytes]]:
+    """Returns the version and the padded data codewords of every symbol of the sequence that carries data."""
+    parts = split_payload(data, ecl, max_version)
+    parity = get_parity(data)
+    return [
+        get_data_codewords(
+            part, ecl, header=get_structured_append_header(index, len(parts), parity), max_version=max_version
+        )
+        for index, part in enumerate(parts)
+    ]
+
+
+def generate_structured_append(
+    data: str,
+    ecl: str,
+    max_version: int = 40,
+    workers: Optional[int] = 1,
+    quiet_zone_border: int = 4,
+    mask: MaskOption = "exhaustive",
+) -> List[NDArray]:
+    """Returns the matrices of a Structured Append sequence of up to 16 symbols, of at most max_version each,
+    that together carry data. The symbols are independent, so with workers other than 1 they are generated by
+    that many worker processes, or one per CPU core if workers is None."""
+    symbols = get_structured_append_codewords(data, ecl, max_version)
+    if workers == 1:
+        return generate_symbol_matrices(symbols, ecl, quiet_zone_border, mask)
+    from qpyr._lib.parallel import generate_symbol_matrices_parallel  # multiprocessing is slow to import
+
+    return generate_symbol_matrices_parallel(
+        symbols, ecl, workers=workers, chunksize=1, quiet_zone_border=quiet_zone_border, mask=mask
+    )
@@ -0,0 +1,48 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+
+class StageEvent(NamedTuple):
+    stage: str  # encode, error_correction, placement, masking, format_placement, mask_evaluation, ...
+    duration: float  # seconds
+    metadata: Dict[str, Any]  # version, ecl, mask and other details of the stage
+
+
+Tracer = Callable[[StageEvent], None]
+
+_tracer: ContextVar[Optional[Tracer]] = ContextVar("qpyr_tracer", default=None)
+
+
+def get_tracer() -> Optional[Tracer]:
+    """Returns the tracer of the current context, or None when tracing is disabled."""
+    return _tracer.get()
+
+
+def record(tracer: Tracer, stage: str, start: float, **metadata: Any) -> float:
+    """Reports the stage that began at the perf_counter() time start to tracer and returns the current time,
+    which is the start of the next stage. Instrumented code only calls this when get_tracer() is not None,
+    so disabled tracing costs one context variable lookup per instrumented function."""
+    now = time.perf_counter()
+    tracer(StageEvent(stage, now - start, metadata))
+    return now
+
+
+@contextmanager
+def trace(callback: Optional[Tracer] = None) -> Iterator[List[StageEvent]]:
+    """Traces every pipeline stage run in this context, in this thread or asyncio task, until the block exits.
+    Events are appended to the yielded list and passed to callback, if given, for example to forward them to
+    a metrics or tracing system. Matrices generated in worker processes are not traced."""
+    events: List[StageEvent] = []
+
+    def tracer(event: StageEvent) -> None:
+        events.append(event)
+        if callback is not None:
+            callback(event)
+
+    token = _tracer.set(tracer)
+    try:
+        yield events
+    finally:
+        _tracer.reset(token)
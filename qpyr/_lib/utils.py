@@ -1,25 +1,47 @@
+from functools import lru_cache
+from typing import Tuple
+
 from qpyr._lib.static import ECC_CODEWORDS_PER_BLOCK, NUM_ERROR_CORRECTION_BLOCKS, TOTAL_NUMBER_OF_CODEWORDS
 
 
-def bits_to_bytearray(bit_string):
-    byte_array = bytearray()
+class BitBuffer:
+    """Append-only sequence of bits backed by a single Python integer, most significant bit first."""
+
+    def __init__(self, bits: str = ""):
+        self._value: int = int(bits, 2) if bits else 0
+        self._length: int = len(bits)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, BitBuffer):
+            return NotImplemented
+        return (self._value, self._length) == (other._value, other._length)
+
+    def __str__(self) -> str:
+        return bin(self._value)[2:].zfill(self._length) if self._length else ""
+
+    def __repr__(self) -> str:
+        return f"BitBuffer('{self}')"
 
-    # Split the string into 8-bit chunks and convert to bytes
-    for i in range(0, len(bit_string), 8):
-        byte_chunk = bit_string[i : i + 8]
-        byte = int(byte_chunk, 2)
-        byte_array.append(byte)
+    def append_bits(self, value: int, length: int) -> None:
+        """Appends the given number of low-order bits of value."""
+        if length < 0 or value >> length != 0:
+            raise ValueError("Value out of range")
+        self._value = (self._value << length) | value
+        self._length += length
 
-    return byte_array
+    def append_bytes(self, data: bytes) -> None:
+        self.append_bits(int.from_bytes(data, "big"), len(data) * 8)
 
+    def extend(self, other: "BitBuffer") -> None:
+        self.append_bits(other._value, other._length)
 
-def bytearray_to_bits(byte_array):
-    bit_string = ""
-    for byte in byte_array:
-        binary_representation = bin(byte)[2:]  # Remove the '0b' prefix
-        padded_binary = binary_representation.zfill(8)  # Pad with zeros to make it 8 bits long
-        bit_string += padded_binary
-    return bit_string
+    def to_bytes(self) -> bytes:
+        """Returns the bits packed into bytes, with the last byte padded with zero bits if needed."""
+        padding = -self._length % 8
+        return (self._value << padding).to_bytes((self._length + padding) // 8, "big")
 
 
 def get_version(grid_size: int):
@@ -31,13 +53,14 @@ def get_grid_size(version: int):
 
 
 def get_segment_character_bits_length(mode: str, version: int):
-    result = 0
-    if mode == "byte":
-        if version <= 9:
-            result = 8
-        else:
-            result = 16
-    return result
+    """Returns the width of the character count field of a segment, which grows for versions 10 and 27."""
+    widths = {"numeric": (10, 12, 14), "alphanumeric": (9, 11, 13), "byte": (8, 16, 16)}[mode]
+    if version <= 9:
+        return widths[0]
+    elif version <= 26:
+        return widths[1]
+    else:
+        return widths[2]
 
 
 def get_total_data_capacity_bytes(ecl: str, version: int) -> int:
@@ -47,6 +70,22 @@ def get_total_data_capacity_bytes(ecl: str, version: int) -> int:
     return total_data_codewords
 
 
+@lru_cache(maxsize=None)
+def get_data_capacity_bits_table(ecl: str) -> Tuple[int, ...]:
+    """Returns the data capacity in bits of every version, indexed by version - 1."""
+    return tuple(get_total_data_capacity_bytes(ecl, version) * 8 for version in range(1, 41))
+
+
+@lru_cache(maxsize=None)
+def get_segment_capacity_bits_table(mode: str, ecl: str) -> Tuple[int, ...]:
+    """Returns how many data bits of a single segment fit after its mode indicator and character count, indexed
+    by version - 1. The table is strictly increasing, so the smallest version for a length can be bisected."""
+    return tuple(
+        capacity_bits - 4 - get_segment_character_bits_length(mode, version)
+        for version, capacity_bits in enumerate(get_data_capacity_bits_table(ecl), start=1)
+    )
+
+
 def get_num_raw_data_modules(version: int) -> int:
     """Returns the number of data bits that can be stored in a QR Code of the given version number, after
     all function modules are excluded. This includes remainder bits, so it might not be a multiple of 8.
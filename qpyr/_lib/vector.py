@@ -0,0 +1,166 @@
+import io
+import time
+import zlib
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from numpy.typing import NDArray
+
+from qpyr._lib.static import ColorValue
+from qpyr._lib.tracing import get_tracer, record
+
+# (x, y, width, height) in modules, with the origin at the top left corner of the grid.
+Rectangle = Tuple[int, int, int, int]
+
+# Number of rectangles formatted per write to the output.
+WRITE_BATCH_SIZE = 512
+
+
+def get_dark_rectangles(grid: NDArray) -> List[Rectangle]:
+    """Returns rectangles covering every dark module of grid. Horizontal runs of dark modules are merged
+    into one rectangle, and identical runs on consecutive rows are merged into a taller rectangle."""
+    dark = np.zeros((grid.shape[0], grid.shape[1] + 2), dtype=np.int8)
+    dark[:, 1:-1] = grid == ColorValue.BLACK
+    edges = np.diff(dark, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+
+    result: List[List[int]] = []
+    open_rectangles: Dict[Tuple[int, int], List[int]] = {}
+    for row, start, width in zip(rows.tolist(), starts.tolist(), (ends - starts).tolist()):
+        rectangle = open_rectangles.get((start, width))
+        if rectangle is not None and rectangle[1] + rectangle[3] == row:
+            rectangle[3] += 1
+        else:
+            rectangle = [start, row, width, 1]
+            open_rectangles[(start, width)] = rectangle
+            result.append(rectangle)
+    return [(x, y, width, height) for x, y, width, height in result]
+
+
+def _batched(lines: Iterable[str]) -> Iterator[bytes]:
+    batch: List[str] = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) == WRITE_BATCH_SIZE:
+            yield "".join(batch).encode("ascii")
+            batch = []
+    yield "".join(batch).encode("ascii")
+
+
+def _write(chunks: Iterable[bytes], out: Optional[BinaryIO], fileformat: str) -> Optional[bytes]:
+    """Writes chunks to out, or returns them joined if out is None."""
+    tracer = get_tracer()
+    start = time.perf_counter() if tracer else 0.0
+    target = io.BytesIO() if out is None else out
+    length = 0
+    for chunk in chunks:
+        target.write(chunk)
+        length += len(chunk)
+    if tracer:
+        record(tracer, "vector_output", start, format=fileformat, bytes=length)
+    return target.getvalue() if out is None else None
+
+
+def _svg_chunks(grid: NDArray, cell_size: int, dark_color: str, light_color: str) -> Iterator[bytes]:
+    size = grid.shape[0]
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" width="{size * cell_size}" '
+        f'height="{size * cell_size}" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">\n'
+        f'<rect width="{size}" height="{size}" fill="{light_color}"/>\n'
+        f'<path fill="{dark_color}" d="'
+    ).encode("ascii")
+    rectangles = get_dark_rectangles(grid)
+    yield from _batched(f"M{x} {y}h{width}v{height}h-{width}z" for x, y, width, height in rectangles)
+    yield b'"/>\n</svg>\n'
+
+
+def write_svg(
+    grid: NDArray,
+    out: Optional[BinaryIO] = None,
+    cell_size: int = 20,
+    dark_color: str = "#000000",
+    light_color: str = "#ffffff",
+) -> Optional[bytes]:
+    """Writes grid as an SVG image with one path for all dark modules to the binary file-like object out, or
+    returns the SVG document as bytes if out is None. cell_size is the size of one module in pixels."""
+    if grid.shape[0] != grid.shape[1]:
+        raise ValueError("The input grid must be square (n x n).")
+    return _write(_svg_chunks(grid, cell_size, dark_color, light_color), out, "svg")
+
+
+def _eps_chunks(grid: NDArray, cell_size: int) -> Iterator[bytes]:
+    size = grid.shape[0]
+    yield (
+        "%!PS-Adobe-3.0 EPSF-3.0\n"
+        f"%%BoundingBox: 0 0 {size * cell_size} {size * cell_size}\n"
+        "%%Creator: qpyr\n"
+        "%%EndComments\n"
+        "gsave\n"
+        f"{cell_size} {cell_size} scale\n"
+        f"1 setgray 0 0 {size} {size} rectfill\n"
+        "0 setgray\n"
+        "/R { rectfill } bind def\n"
+    ).encode("ascii")
+    # PostScript puts the origin at the bottom left corner.
+    rectangles = get_dark_rectangles(grid)
+    yield from _batched(f"{x} {size - y - height} {width} {height} R\n" for x, y, width, height in rectangles)
+    yield b"grestore\n%%EOF\n"
+
+
+def write_eps(grid: NDArray, out: Optional[BinaryIO] = None, cell_size: int = 20) -> Optional[bytes]:
+    """Writes grid as an EPS image to the binary file-like object out, or returns the EPS document as bytes if
+    out is None. cell_size is the size of one module in points."""
+    if grid.shape[0] != grid.shape[1]:
+        raise ValueError("The input grid must be square (n x n).")
+    return _write(_eps_chunks(grid, cell_size), out, "eps")
+
+
+def _pdf_chunks(grid: NDArray, cell_size: int) -> Iterator[bytes]:
+    size = grid.shape[0]
+    page_size = size * cell_size
+
+    # PDF puts the origin at the bottom left corner.
+    rectangles = get_dark_rectangles(grid)
+    content = b"".join(
+        [f"{cell_size} 0 0 {cell_size} 0 0 cm\n1 g 0 0 {size} {size} re f\n0 g\n".encode("ascii")]
+        + list(_batched(f"{x} {size - y - height} {width} {height} re\n" for x, y, width, height in rectangles))
+        + [b"f\n"]
+    )
+    content = zlib.compress(content)
+
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {page_size} {page_size}] /Contents 4 0 R "
+        "/Resources << >> >>".encode("ascii"),
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode("ascii") + content + b"\nendstream",
+    ]
+
+    offset = 0
+    header = b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n"
+    yield header
+    offset += len(header)
+    object_offsets = []
+    for number, body in enumerate(objects, start=1):
+        chunk = f"{number} 0 obj\n".encode("ascii") + body + b"\nendobj\n"
+        object_offsets.append(offset)
+        yield chunk
+        offset += len(chunk)
+
+    xref = [f"xref\n0 {len(objects) + 1}\n", "0000000000 65535 f \n"]
+    xref += [f"{object_offset:010d} 00000 n \n" for object_offset in object_offsets]
+    xref += [f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{offset}\n%%EOF\n"]
+    yield "".join(xref).encode("ascii")
+
+
+def write_pdf(grid: NDArray, out: Optional[BinaryIO] = None, cell_size: int = 20) -> Optional[bytes]:
+    """Writes grid as a single page PDF document to the binary file-like object out, or returns the document
+    as bytes if out is None. cell_size is the size of one module in points."""
+    if grid.shape[0] != grid.shape[1]:
+        raise ValueError("The input grid must be square (n x n).")
+    return _write(_pdf_chunks(grid, cell_size), out, "pdf")
+
+
+VECTOR_WRITERS = {"svg": write_svg, "eps": write_eps, "pdf": write_pdf}
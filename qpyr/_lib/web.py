@@ -0,0 +1,191 @@
+import hashlib
+from concurrent.futures import Executor
+from http import HTTPStatus
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+from urllib.parse import parse_qs
+
+from qpyr._lib.aio import DEFAULT_MAX_CONCURRENCY, AsyncQR
+from qpyr._lib.cache import QRCache
+from qpyr._lib.static import ERROR_CORRECTION_LEVELS
+
+CONTENT_TYPES = {
+    "png": "image/png",
+    "svg": "image/svg+xml",
+    "eps": "application/postscript",
+    "pdf": "application/pdf",
+}
+DEFAULT_SCALE = 10
+MAX_SCALE = 50
+
+# A year: the response is fully determined by the query parameters.
+DEFAULT_MAX_AGE = 365 * 24 * 60 * 60
+
+# Part of every ETag. Bump it whenever the bytes served for the same parameters change, e.g. with a new mask
+# selection or writer, so that clients and proxies do not keep serving stale codes.
+ETAG_VERSION = "1"
+
+Headers = List[Tuple[str, str]]
+
+
+class QRQuery(NamedTuple):
+    data: str
+    ecl: str
+    fileformat: str
+    scale: int  # size of one module in pixels or points
+
+
+class Response(NamedTuple):
+    status: int
+    headers: Headers
+    body: bytes
+
+
+def parse_query(query_string: str) -> QRQuery:
+    """Returns the parameters of query_string: data, and optionally ecl (L, M, Q or H), format (png, svg, eps
+    or pdf) and scale. Raises a ValueError with a message for the client when they are missing or invalid."""
+    params = parse_qs(query_string, keep_blank_values=True)
+    if "data" not in params:
+        raise ValueError("Missing data parameter")
+    ecl = params.get("ecl", ["M"])[0].upper()
+    if ecl not in ERROR_CORRECTION_LEVELS:
+        raise ValueError("ecl must be L, M, Q or H")
+    fileformat = params.get("format", ["png"])[0].lower()
+    if fileformat not in CONTENT_TYPES:
+        raise ValueError(f"format must be one of {', '.join(CONTENT_TYPES)}")
+    scale = params.get("scale", [str(DEFAULT_SCALE)])[0]
+    if not scale.isdigit() or not 1 <= int(scale) <= MAX_SCALE:
+        raise ValueError(f"scale must be an integer from 1 to {MAX_SCALE}")
+    return QRQuery(params["data"][0], ecl, fileformat, int(scale))
+
+
+def get_etag(query: QRQuery) -> str:
+    """Returns the strong ETag of the response to query, derived from its parameters alone."""
+    key = "\0".join([ETAG_VERSION, query.data, query.ecl, query.fileformat, str(query.scale)])
+    return '"' + hashlib.sha256(key.encode("utf-8", "surrogatepass")).hexdigest()[:32] + '"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    """Returns True if the If-None-Match header lists etag or is *. Weak tags match too, since If-None-Match
+    uses the weak comparison."""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or etag in [tag[2:] if tag.startswith("W/") else tag for tag in tags]
+
+
+def _error(status: int, message: str, headers: Sequence[Tuple[str, str]] = ()) -> Response:
+    body = (message + "\n").encode("utf-8")
+    content_headers = [("Content-Type", "text/plain; charset=utf-8"), ("Content-Length", str(len(body)))]
+    return Response(status, content_headers + [("Cache-Control", "no-store"), *headers], body)
+
+
+class _QRApp:
+    """Request handling shared by WSGIApp and ASGIApp. Responses are fully determined by the query, so they
+    carry a strong ETag and a long-lived Cache-Control header, and conditional requests are answered with 304
+    before anything is generated. Rendered files are kept in the image tier of cache, so that repeat requests
+    never run the pipeline again."""
+
+    def __init__(self, cache: Optional[QRCache] = None, max_age: int = DEFAULT_MAX_AGE):
+        self.cache = cache if cache is not None else QRCache()
+        self.max_age = max_age
+
+    def _prepare(
+        self, method: str, query_string: str, if_none_match: Optional[str]
+    ) -> Union[Response, Tuple[QRQuery, Headers]]:
+        """Returns the response if it does not need the image, or else the query and the caching headers."""
+        if method not in ("GET", "HEAD"):
+            return _error(HTTPStatus.METHOD_NOT_ALLOWED, "Method not allowed", [("Allow", "GET, HEAD")])
+        try:
+            query = parse_query(query_string)
+        except ValueError as error:
+            return _error(HTTPStatus.BAD_REQUEST, str(error))
+        etag = get_etag(query)
+        headers = [("ETag", etag), ("Cache-Control", f"public, max-age={self.max_age}, immutable")]
+        if etag_matches(etag, if_none_match):
+            return Response(HTTPStatus.NOT_MODIFIED, headers, b"")
+        return query, headers
+
+    @staticmethod
+    def _finish(query: QRQuery, headers: Headers, image: bytes) -> Response:
+        content_headers = [("Content-Type", CONTENT_TYPES[query.fileformat]), ("Content-Length", str(len(image)))]
+        return Response(HTTPStatus.OK, content_headers + headers, image)
+
+
+class WSGIApp(_QRApp):
+    """WSGI application that serves the QR code of the query parameters data, ecl, format and scale, e.g.
+    GET /?data=hello&format=svg&scale=4. It only needs the standard library."""
+
+    def get_response(self, method: str, query_string: str, if_none_match: Optional[str] = None) -> Response:
+        prepared = self._prepare(method, query_string, if_none_match)
+        if isinstance(prepared, Response):
+            return prepared
+        query, headers = prepared
+        try:
+            image = self.cache.get_image_bytes(query.data, query.fileformat, ecl=query.ecl, cell_size=query.scale)
+        except ValueError as error:  # e.g. Data too long
+            return _error(HTTPStatus.BAD_REQUEST, str(error))
+        return self._finish(query, headers, image)
+
+    def __call__(self, environ: Dict[str, Any], start_response: Callable[..., Any]) -> Iterable[bytes]:
+        method = environ.get("REQUEST_METHOD", "GET")
+        response = self.get_response(method, environ.get("QUERY_STRING", ""), environ.get("HTTP_IF_NONE_MATCH"))
+        status = HTTPStatus(response.status)
+        start_response(f"{status.value} {status.phrase}", response.headers)
+        return [b"" if method == "HEAD" else response.body]
+
+
+class ASGIApp(_QRApp):
+    """ASGI application with the same endpoint as WSGIApp. Cache misses are generated through an AsyncQR with
+    executor and max_concurrency, so identical concurrent requests share one computation and the event loop
+    is not blocked."""
+
+    def __init__(
+        self,
+        cache: Optional[QRCache] = None,
+        max_age: int = DEFAULT_MAX_AGE,
+        executor: Optional[Executor] = None,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        super().__init__(cache, max_age)
+        self.qr = AsyncQR(executor, max_concurrency, cache=self.cache)
+
+    async def get_response(self, method: str, query_string: str, if_none_match: Optional[str] = None) -> Response:
+        prepared = self._prepare(method, query_string, if_none_match)
+        if isinstance(prepared, Response):
+            return prepared
+        query, headers = prepared
+        try:
+            image = await self.qr.get_image_bytes(query.data, query.fileformat, ecl=query.ecl, cell_size=query.scale)
+        except ValueError as error:  # e.g. Data too long
+            return _error(HTTPStatus.BAD_REQUEST, str(error))
+        return self._finish(query, headers, image)
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable[..., Any], send: Callable[..., Any]) -> None:
+        if scope["type"] == "lifespan":
+            while True:
+                message = await receive()
+                if message["type"] == "lifespan.startup":
+                    await send({"type": "lifespan.startup.complete"})
+                elif message["type"] == "lifespan.shutdown":
+                    await send({"type": "lifespan.shutdown.complete"})
+                    return
+        if scope["type"] != "http":
+            raise ValueError(f"Unsupported scope type {scope['type']!r}")
+
+        headers = dict(scope.get("headers", []))
+        if_none_match = headers.get(b"if-none-match")
+        response = await self.get_response(
+            scope["method"],
+            scope.get("query_string", b"").decode("latin-1"),
+            if_none_match.decode("latin-1") if if_none_match is not None else None,
+        )
+        await send(
+            {
+                "type": "http.response.start",
+                "status": int(response.status),
+                "headers": [
+                    (name.lower().encode("latin-1"), value.encode("latin-1")) for name, value in response.headers
+                ],
+            }
+        )
+        await send({"type": "http.response.body", "body": b"" if scope["method"] == "HEAD" else response.body})
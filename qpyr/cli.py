@@ -0,0 +1,215 @@
+"""Bulk generation of QR codes from the command line.
+
+Payloads are read from a file or stdin, one per line or from a CSV column, and every QR code is written
+straight into a zip or tar archive, or into a directory with sharded subdirectories:
+
+    qpyr payloads.txt --output codes.zip
+    cut -d, -f3 orders.csv | qpyr --output codes.tar.gz --format svg --workers 4
+    qpyr orders.csv --csv --column url --output codes --shard-size 1000
+"""
+
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+from collections import deque
+from itertools import islice
+from typing import IO, Deque, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+FORMATS = ("png", "svg", "eps", "pdf", "npy")
+MASK_OPTIONS = ("fast", "exhaustive")
+DEFAULT_CHUNK_SIZE = 256
+
+# Seconds between two progress lines.
+PROGRESS_INTERVAL = 1.0
+
+# (file contents, error message) of every payload of a chunk, exactly one of them set.
+ChunkResult = List[Tuple[Optional[bytes], Optional[str]]]
+
+
+def parse_mask(value: str) -> Union[int, str]:
+    """argparse type of --mask: a mask reference from 0 to 7, fast or exhaustive."""
+    if value in MASK_OPTIONS:
+        return value
+    if value.isdigit() and int(value) < 8:
+        return int(value)
+    raise argparse.ArgumentTypeError(f"invalid mask {value!r}: use 0-7, fast or exhaustive")
+
+
+def parse_positive_int(value: str) -> int:
+    """argparse type of the sizes: an integer of at least 1."""
+    if not value.isdigit() or int(value) < 1:
+        raise argparse.ArgumentTypeError(f"invalid value {value!r}: must be an integer of at least 1")
+    return int(value)
+
+
+def parse_non_negative_int(value: str) -> int:
+    """argparse type of --workers: an integer of at least 0."""
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError(f"invalid value {value!r}: must be an integer of at least 0")
+    return int(value)
+
+
+def read_payloads(fp: IO[str], use_csv=False, column: str = "0") -> Iterator[str]:
+    """Returns an iterator over the payloads of fp: every non-empty line, or with use_csv the given column of
+    every row. column is an index, or the name of a column in the header row, which is read and checked right
+    away so that a missing column raises a ValueError before any payload is consumed."""
+    if not use_csv:
+        return (payload for payload in (line.rstrip("\r\n") for line in fp) if payload)
+
+    reader = csv.reader(fp)
+    if column.isdigit():
+        index = int(column)
+    else:
+        header = next(reader, [])
+        if column not in header:
+            raise ValueError(f"Column {column!r} not found in the CSV header")
+        index = header.index(column)
+    return (row[index] for row in reader if len(row) > index and row[index])
+
+
+def _render(grid, fileformat: str, cell_size: int) -> bytes:
+    if fileformat == "npy":
+        import numpy as np
+
+        buffer = io.BytesIO()
+        np.save(buffer, grid)
+        return buffer.getvalue()
+
+    from qpyr._lib.output import write_image
+
+    return write_image(grid, fileformat, cell_size=cell_size)  # type: ignore
+
+
+def generate_chunk(payloads: Sequence[str], ecl: str, fileformat: str, cell_size: int, mask) -> ChunkResult:
+    """Returns the file contents of every payload, or the reason it could not be encoded, in input order."""
+    from qpyr._lib.stream import stream_matrices
+
+    def sink(index: int, payload: str, grid) -> bytes:
+        return _render(grid, fileformat, cell_size)
+
+    return [
+        (None, str(item.error)) if item.error else (item.result, None)
+        for item in stream_matrices(payloads, ecl, sink=sink, window=len(payloads), mask=mask)
+    ]
+
+
+def _chunks(payloads: Iterable[str], chunksize: int) -> Iterator[List[str]]:
+    iterator = iter(payloads)
+    while True:
+        chunk = list(islice(iterator, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def generate_chunks(
+    payloads: Iterable[str], ecl: str, fileformat: str, cell_size: int, mask, workers: int, chunksize: int
+) -> Iterator[ChunkResult]:
+    """Yields the result of every chunk of payloads in input order. With more than one worker, the chunks are
+    generated by that many worker processes, with at most two chunks per worker in flight."""
+    if workers == 1:
+        for chunk in _chunks(payloads, chunksize):
+            yield generate_chunk(chunk, ecl, fileformat, cell_size, mask)
+        return
+
+    from concurrent.futures import Future, ProcessPoolExecutor
+
+    from qpyr._lib.parallel import preload_tables
+
+    preload_tables()
+    with ProcessPoolExecutor(max_workers=workers, initializer=preload_tables) as executor:
+        pending: Deque[Future] = deque()
+        for chunk in _chunks(payloads, chunksize):
+            pending.append(executor.submit(generate_chunk, chunk, ecl, fileformat, cell_size, mask))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+class Progress:
+    """Reports the number of codes written, errors and throughput to out at most every PROGRESS_INTERVAL."""
+
+    def __init__(self, out: Optional[IO[str]]):
+        self.out = out
+        self.written = 0
+        self.errors = 0
+        self.start = self.last_report = time.perf_counter()
+
+    def update(self, written: int, errors: int) -> None:
+        self.written += written
+        self.errors += errors
+        now = time.perf_counter()
+        if self.out is not None and now - self.last_report >= PROGRESS_INTERVAL:
+            self.last_report = now
+            print(self.format(now), file=self.out, flush=True)
+
+    def format(self, now: float) -> str:
+        elapsed = now - self.start
+        rate = self.written / elapsed if elapsed > 0 else 0.0
+        return f"{self.written} codes, {self.errors} errors, {elapsed:.1f} s, {rate:.0f} codes/s"
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    from qpyr._lib.archive import open_archive
+
+    parser = argparse.ArgumentParser(prog="qpyr", description="Generate QR codes in bulk into an archive.")
+    parser.add_argument("input", nargs="?", default="-", help="file of payloads, stdin if - or omitted")
+    parser.add_argument("--csv", action="store_true", help="read payloads from a CSV column instead of lines")
+    parser.add_argument("--column", default="0", help="CSV column index, or name in the header row")
+    parser.add_argument(
+        "--output", required=True, help="zip or tar (.tar, .tar.gz, .tgz) archive, or directory to write into"
+    )
+    parser.add_argument("--format", choices=FORMATS, default="png", help="file format, npy for the module matrix")
+    parser.add_argument("--ecl", choices=("L", "M", "Q", "H"), default="M", help="error correction level")
+    parser.add_argument("--mask", type=parse_mask, default="exhaustive", help="mask reference 0-7, fast or exhaustive")
+    parser.add_argument("--cell-size", type=parse_positive_int, default=10, help="size of a module in pixels or points")
+    parser.add_argument(
+        "--workers", type=parse_non_negative_int, default=1, help="worker processes, 0 for one per CPU core"
+    )
+    parser.add_argument("--chunk-size", type=parse_positive_int, default=DEFAULT_CHUNK_SIZE, help="payloads per task")
+    parser.add_argument(
+        "--shard-size", type=parse_positive_int, default=1000, help="files per subdirectory of a directory"
+    )
+    parser.add_argument("--quiet", action="store_true", help="do not report progress or errors")
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    log = None if args.quiet else sys.stderr
+    progress = Progress(log)
+
+    try:
+        fp = sys.stdin if args.input == "-" else open(args.input, newline="", encoding="utf-8")
+    except OSError as error:
+        parser.error(str(error))
+    try:
+        # Everything that can reject the arguments runs before open_archive() creates the output.
+        payloads = read_payloads(fp, use_csv=args.csv, column=args.column)
+        chunk_results = generate_chunks(
+            payloads, args.ecl, args.format, args.cell_size, args.mask, workers, args.chunk_size
+        )
+        with open_archive(args.output, args.shard_size) as archive:
+            index = 0
+            for chunk_result in chunk_results:
+                errors = 0
+                for data, error in chunk_result:
+                    if data is None:
+                        errors += 1
+                        if log is not None:
+                            print(f"payload {index}: {error}", file=log)
+                    else:
+                        archive.write(index, args.format, data)
+                    index += 1
+                progress.update(len(chunk_result) - errors, errors)
+    except ValueError as error:
+        parser.error(str(error))
+    finally:
+        if fp is not sys.stdin:
+            fp.close()
+
+    if log is not None:
+        print(progress.format(time.perf_counter()), file=log)
+    return 1 if progress.errors else 0
@@ -1,17 +1,150 @@
-from qpyr._lib.encode import encode
-from qpyr._lib.matrix import matrix
-from qpyr._lib.draw import draw
+"""Entry points of qpyr. They are imported by every `import qpyr`, so numpy, Pillow and the multiprocessing
+machinery are only imported inside the functions that need them."""
 
+from __future__ import annotations
+
+import os
+from typing import TYPE_CHECKING, Iterable, List, Optional, Union
+
+if TYPE_CHECKING:
+    from numpy.typing import NDArray
+    from PIL import Image
+
+    from qpyr._lib.cache import QRCache
+    from qpyr._lib.matrix import MaskedMatrices, MaskOption
+
+
+def _get_file_format(filepath: str, fileformat: str) -> str:
+    return (fileformat or os.path.splitext(filepath)[1].lstrip(".")).lower()
+
+
+def main(
+    data: str,
+    filepath: str = "",
+    fileformat="",
+    ecl="M",
+    show_image=False,
+    mask: MaskOption = "exhaustive",
+    boost_ecl=False,
+    cache: Optional[QRCache] = None,
+) -> Optional[Image.Image]:
+    """Creates the QR code of data and returns it as an image.
+
+    SVG, EPS and PDF files are written by the vector writers without rendering an image, in which case None
+    is returned unless show_image is set. PNG files are written by write_png and every other file format is
+    saved by PIL.
+
+    mask is a fixed mask reference from 0 to 7, "fast" for a mask chosen from estimated penalties, or
+    "exhaustive" for the mask with the lowest penalty. With boost_ecl, ecl is raised to the highest error
+    correction level that still fits the same version.
+
+    With a cache, the matrix and the file contents are looked up in it before they are generated.
+    """
+    from qpyr._lib.png import write_png
+    from qpyr._lib.vector import VECTOR_WRITERS
+
+    if cache is not None:
+        qr_matrix = cache.get_matrix(data, ecl=ecl, mask=mask, boost_ecl=boost_ecl)
+    else:
+        qr_matrix = get_matrix(data, ecl=ecl, mask=mask, boost_ecl=boost_ecl)
+
+    file_format = _get_file_format(filepath, fileformat)
+    vector_writer = VECTOR_WRITERS.get(file_format) if filepath else None
+    if filepath and cache is not None:
+        with open(filepath, "wb") as fp:
+            fp.write(cache.get_image_bytes(data, file_format, ecl=ecl, mask=mask, boost_ecl=boost_ecl))
+    elif vector_writer:
+        with open(filepath, "wb") as fp:
+            vector_writer(qr_matrix, fp)
+    elif filepath and file_format == "png":
+        with open(filepath, "wb") as fp:
+            write_png(qr_matrix, fp, cell_size=20)
+    if vector_writer and not show_image:
+        return None
+
+    from qpyr._lib.draw import draw
 
-def main(data: str, filepath: str = "", fileformat="", ecl="M", show_image=False):
-    version, binary_str = encode(data, ecl=ecl)
-    qr_matrix = matrix(binary_str, version, ecl=ecl)
     image = draw(qr_matrix)
 
-    if filepath:
+    if filepath and not vector_writer and cache is None and file_format != "png":
         image.save(fp=filepath, format=fileformat)
 
     if show_image:
         image.show()
 
     return image
+
+
+def get_matrix(data: str, ecl="M", mask: MaskOption = "exhaustive", boost_ecl=False) -> NDArray:
+    """Returns the module matrix of data, including the quiet zone, without rendering it."""
+    from qpyr._lib.encode import encode, get_boosted_ecl
+    from qpyr._lib.matrix import matrix
+
+    ecl = get_boosted_ecl(data, ecl) if boost_ecl else ecl
+    version, codewords = encode(data, ecl=ecl)
+    return matrix(codewords, version, ecl=ecl, mask=mask)
+
+
+def get_masked_matrix(data: str, ecl="M", mask: MaskOption = "exhaustive", boost_ecl=False) -> MaskedMatrices:
+    """Same as get_matrix(), but also reports the chosen mask and its penalty score, as a stack of one matrix."""
+    from qpyr._lib.encode import encode, get_boosted_ecl
+    from qpyr._lib.matrix import masked_matrices
+
+    ecl = get_boosted_ecl(data, ecl) if boost_ecl else ecl
+    version, codewords = encode(data, ecl=ecl)
+    return masked_matrices([codewords], version, ecl=ecl, mask=mask)
+
+
+def get_matrices(
+    data: Iterable[str],
+    ecl="M",
+    images=False,
+    cell_size: int = 20,
+    workers: Optional[int] = 1,
+    mask: MaskOption = "exhaustive",
+) -> Union[List[NDArray], List[Image.Image]]:
+    """Returns the module matrices, or the images if images is set, of many payloads in input order.
+
+    Much faster than calling main() in a loop: payloads are grouped by version and processed as stacks, and
+    duplicate payloads are only computed once. With workers other than 1 the payloads are spread over that
+    many worker processes, or one per CPU core if workers is None.
+    """
+    if workers == 1:
+        from qpyr._lib.batch import generate_matrices
+
+        qr_matrices = generate_matrices(data, ecl=ecl, mask=mask)
+    else:
+        from qpyr._lib.parallel import generate_matrices_parallel
+
+        qr_matrices = generate_matrices_parallel(data, ecl=ecl, workers=workers, mask=mask)
+    if images:
+        from qpyr._lib.draw import draw
+
+        return [draw(qr_matrix, cell_size=cell_size) for qr_matrix in qr_matrices]
+    return qr_matrices
+
+
+def get_structured_append(
+    data: str,
+    ecl="M",
+    max_version: int = 40,
+    images=False,
+    cell_size: int = 20,
+    workers: Optional[int] = 1,
+    mask: MaskOption = "exhaustive",
+) -> Union[List[NDArray], List[Image.Image]]:
+    """Splits data over a Structured Append sequence of up to 16 linked symbols of at most max_version each,
+    and returns their module matrices, or images if images is set, in sequence order.
+
+    This carries payloads that are too long for a single version 40 symbol, and several small symbols are
+    also faster to generate than one large one. With workers other than 1 the symbols are generated by that
+    many worker processes, or one per CPU core if workers is None.
+    """
+    from qpyr._lib.structured_append import generate_structured_append
+
+    qr_matrices = generate_structured_append(data, ecl=ecl, max_version=max_version, workers=workers, mask=mask)
+    if images:
+        from qpyr._lib.draw import draw
+
+        return [draw(qr_matrix, cell_size=cell_size) for qr_matrix in qr_matrices]
+    return qr_matrices
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from qpyr._lib.aio import AsyncQR
+from qpyr._lib.cache import QRCache
+from qpyr._lib.png import write_png
+from qpyr.main import get_matrix
+
+
+class TrackingExecutor(ThreadPoolExecutor):
+    """Counts submitted calls and the most that run at once, each taking at least delay seconds."""
+
+    def __init__(self, delay: float = 0.0):
+        super().__init__(max_workers=8)
+        self.delay = delay
+        self.submitted = 0
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs):
+        self.submitted += 1
+
+        def tracked():
+            with self.lock:
+                self.running += 1
+                self.max_running = max(self.max_running, self.running)
+            try:
+                time.sleep(self.delay)
+                return fn(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self.running -= 1
+
+        return super().submit(tracked)
+
+
+def test_get_matrix_and_image_bytes():
+    async def run():
+        qr = AsyncQR()
+        return await qr.get_matrix("hello", ecl="Q"), await qr.get_image_bytes("hello", "PNG", ecl="Q", cell_size=2)
+
+    qr_matrix, png = asyncio.run(run())
+    assert np.array_equal(qr_matrix, get_matrix("hello", ecl="Q"))
+    assert not qr_matrix.flags.writeable
+    assert png == write_png(qr_matrix, cell_size=2)
+
+
+def test_coalesces_identical_requests():
+    executor = TrackingExecutor(delay=0.05)
+
+    async def run():
+        qr = AsyncQR(executor)
+        return await asyncio.gather(*[qr.get_matrix("same") for _ in range(5)], qr.get_matrix("other"))
+
+    results = asyncio.run(run())
+    assert executor.submitted == 2
+    assert all(result is results[0] for result in results[:5])
+
+
+def test_limits_concurrency():
+    executor = TrackingExecutor(delay=0.02)
+
+    async def run():
+        qr = AsyncQR(executor, max_concurrency=2)
+        await asyncio.gather(*[qr.get_matrix(str(i)) for i in range(8)])
+
+    asyncio.run(run())
+    assert executor.max_running == 2
+    with pytest.raises(ValueError):
+        AsyncQR(max_concurrency=0)
+
+
+def test_cancellation():
+    executor = TrackingExecutor(delay=0.05)
+
+    async def run():
+        qr = AsyncQR(executor, max_concurrency=1)
+        blocking = asyncio.ensure_future(qr.get_matrix("first"))
+        shared = [asyncio.ensure_future(qr.get_matrix("second")) for _ in range(2)]
+        queued = asyncio.ensure_future(qr.get_matrix("third"))
+        await asyncio.sleep(0.01)
+        shared[0].cancel()
+        queued.cancel()
+        await blocking
+        assert np.array_equal(await shared[1], get_matrix("second"))
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert qr._get_loop_state().computations == {}
+
+    asyncio.run(run())
+    assert executor.submitted == 2  # the cancelled request never reached the executor
+
+
+def test_reuse_across_event_loops():
+    executor = TrackingExecutor(delay=0.02)
+    qr = AsyncQR(executor, max_concurrency=1)
+
+    async def run(prefix):
+        return await asyncio.gather(*[qr.get_matrix(f"{prefix}{i}") for i in range(3)])
+
+    for prefix in ["first", "second"]:
+        results = asyncio.run(run(prefix))
+        assert np.array_equal(results[2], get_matrix(f"{prefix}2"))
+    assert executor.max_running == 1
+    assert len(qr._loop_states) == 1  # the state of the first, closed loop was dropped
+
+
+def test_errors_and_cache():
+    cache = QRCache()
+
+    async def run():
+        qr = AsyncQR(cache=cache)
+        with pytest.raises(ValueError, match="Data too long"):
+            await qr.get_matrix("x" * 3000)
+        first = await qr.get_matrix("cached")
+        assert await qr.get_matrix("cached") is first
+        assert cache.get_matrix("cached") is first
+
+    asyncio.run(run())
+    assert cache.stats()["matrices"].hits == 2
+
+
+def test_process_executor():
+    async def run():
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            return await AsyncQR(executor).get_matrix("hello")
+
+    assert np.array_equal(asyncio.run(run()), get_matrix("hello"))
@@ -0,0 +1,45 @@
+import os
+import tarfile
+import zipfile
+
+import pytest
+
+from qpyr._lib.archive import Archive, ShardedDirectory, TarArchive, ZipArchive, open_archive
+
+
+def test_zip_archive(tmp_path):
+    path = str(tmp_path / "codes.zip")
+    with open_archive(path) as archive:
+        assert isinstance(archive, ZipArchive)
+        assert archive.write(0, "png", b"png data") == "0.png"
+        archive.write(1, "svg", b"<svg/>" * 100)
+    with zipfile.ZipFile(path) as zip_file:
+        assert zip_file.read("1.svg") == b"<svg/>" * 100
+        assert zip_file.getinfo("0.png").compress_type == zipfile.ZIP_STORED
+        assert zip_file.getinfo("1.svg").compress_type == zipfile.ZIP_DEFLATED
+
+
+@pytest.mark.parametrize("name", ["codes.tar", "codes.tar.gz", "codes.tgz"])
+def test_tar_archive(tmp_path, name):
+    path = str(tmp_path / name)
+    with open_archive(path) as archive:
+        assert isinstance(archive, TarArchive)
+        archive.write(7, "png", b"png data")
+    with tarfile.open(path) as tar_file:
+        assert tar_file.extractfile("7.png").read() == b"png data"
+
+
+def test_sharded_directory(tmp_path):
+    with open_archive(str(tmp_path / "codes"), shard_size=2) as archive:
+        assert isinstance(archive, ShardedDirectory)
+        names = [archive.write(index, "npy", bytes([index])) for index in range(5)]
+    assert names == [os.path.join(str(index // 2), f"{index}.npy") for index in range(5)]
+    assert sorted(os.listdir(tmp_path / "codes")) == ["0", "1", "2"]
+    assert (tmp_path / "codes" / "1" / "3.npy").read_bytes() == b"\x03"
+    with pytest.raises(ValueError):
+        ShardedDirectory(str(tmp_path), shard_size=0)
+
+
+def test_archive_is_abstract():
+    with pytest.raises(TypeError):
+        Archive()
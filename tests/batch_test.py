@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from qpyr._lib.batch import bucket_by_version, generate_matrices, get_stack_size
+from qpyr._lib.encode import encode
+from qpyr._lib.matrix import matrix
+
+
+def test_bucket_by_version():
+    buckets = bucket_by_version(["a", "b", "a", "x" * 100], ecl="M")
+    assert sorted(buckets) == [1, 6]
+    assert [payload for payload, _ in buckets[1]] == ["a", "b"]
+
+
+def test_bucket_by_version_errors():
+    too_long = "x" * 8000
+    with pytest.raises(ValueError):
+        bucket_by_version(["a", too_long], ecl="M")
+    errors = {}
+    buckets = bucket_by_version(["a", too_long, "b", too_long], ecl="M", errors=errors)
+    assert [payload for payload, _ in buckets[1]] == ["a", "b"]
+    assert list(errors) == [too_long]
+    assert isinstance(errors[too_long], ValueError)
+
+
+def test_get_stack_size():
+    assert get_stack_size(1) > get_stack_size(40) >= 1
+
+
+def test_generate_matrices():
+    data = ["hello", "x" * 100, "world", "hello"]
+    result = generate_matrices(data, ecl="Q")
+    assert len(result) == 4
+    assert result[0] is result[3]
+    for payload, qr_matrix in zip(data, result):
+        version, codewords = encode(payload, ecl="Q")
+        assert np.array_equal(qr_matrix, matrix(codewords, version, ecl="Q"))
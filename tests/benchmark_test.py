@@ -0,0 +1,37 @@
+import pytest
+
+from benchmarks.bench import STAGES, compare, get_stage_input, parse_versions, run, time_import
+
+
+def test_parse_versions():
+    assert parse_versions("1-3,10,40") == [1, 2, 3, 10, 40]
+    with pytest.raises(ValueError):
+        parse_versions("0-2")
+
+
+def test_get_stage_input():
+    inputs = get_stage_input(7, "Q")
+    assert inputs.version == 7
+    assert inputs.finished.shape == (45 + 8, 45 + 8)
+
+
+def test_run():
+    results = run([1, 2], ["L", "H"], list(STAGES), repeat=2)
+    assert len(results["results"]) == 4 * len(STAGES)
+    timing = results["results"]["matrix/v2/H"]
+    assert 0 < timing["min"] <= timing["median"] <= timing["p99"]
+
+
+def test_time_import():
+    timing = time_import("import qpyr", repeat=2)
+    assert 0 < timing["min"] <= timing["median"] <= timing["p99"]
+    assert list(run([], [], [], repeat=1, imports=["qpyr"])["results"]) == ["import/qpyr"]
+
+
+def test_compare():
+    baseline = {"results": {"draw/v1/L": {"min": 1e-3}, "matrix/v1/L": {"min": 1e-3}, "old/v1/L": {"min": 1e-3}}}
+    results = {"results": {"draw/v1/L": {"min": 2e-3}, "matrix/v1/L": {"min": 1.1e-3}, "new/v1/L": {"min": 1.0}}}
+    regressions = compare(results, baseline, threshold=1.25)
+    assert [regression.key for regression in regressions] == ["draw/v1/L"]
+    assert regressions[0].ratio == pytest.approx(2)
+    assert compare(results, baseline, threshold=3) == []
@@ -0,0 +1,75 @@
+import threading
+
+import numpy as np
+import pytest
+
+from qpyr._lib.cache import ENTRY_OVERHEAD_BYTES, LRUCache, QRCache
+from qpyr.main import get_matrix, main
+
+
+def test_lru_cache_eviction():
+    cache = LRUCache(max_bytes=3 * (100 + ENTRY_OVERHEAD_BYTES))
+    for key in "abc":
+        cache.put(key, key.upper(), size=100)
+    assert cache.get("a") == "A"
+    cache.put("d", "D", size=100)
+    assert cache.get("b") is None
+    assert [cache.get(key) for key in "acd"] == ["A", "C", "D"]
+    stats = cache.stats()
+    assert (stats.hits, stats.misses, stats.evictions, stats.entries) == (4, 1, 1, 3)
+    assert stats.size_bytes == 3 * (100 + ENTRY_OVERHEAD_BYTES)
+
+
+def test_lru_cache_too_large_value():
+    cache = LRUCache(max_bytes=1000)
+    cache.put("a", "A", size=10)
+    cache.put("b", "B", size=10000)
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    with pytest.raises(ValueError):
+        LRUCache(max_bytes=-1)
+
+
+def test_lru_cache_threads():
+    cache = LRUCache(max_bytes=50 * (1 + ENTRY_OVERHEAD_BYTES))
+
+    def worker(offset: int) -> None:
+        for i in range(1000):
+            key = (offset + i) % 100
+            cache.get_or_create(key, lambda: key, lambda value: 1)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = cache.stats()
+    assert stats.hits + stats.misses == 8000
+    assert stats.entries <= 50
+    assert stats.size_bytes == stats.entries * (1 + ENTRY_OVERHEAD_BYTES)
+
+
+def test_qr_cache_get_matrix():
+    cache = QRCache()
+    result = cache.get_matrix("hello", ecl="Q")
+    assert cache.get_matrix("hello", ecl="Q") is result
+    assert not result.flags.writeable
+    assert np.array_equal(result, get_matrix("hello", ecl="Q"))
+    assert cache.get_matrix("hello", ecl="Q", mask=2) is not result
+    assert cache.stats()["matrices"].hits == 1
+    assert cache.stats()["matrices"].misses == 2
+
+
+def test_qr_cache_get_image_bytes(tmp_path):
+    cache = QRCache()
+    png = cache.get_image_bytes("hello", "png")
+    assert png.startswith(b"\x89PNG")
+    assert cache.get_image_bytes("hello", "PNG") is png
+    assert cache.get_image_bytes("hello", "svg").startswith(b"<?xml")
+    assert cache.get_image_bytes("hello", "jpg").startswith(b"\xff\xd8")
+
+    filepath = tmp_path / "qr.png"
+    image = main("hello", filepath=str(filepath), cache=cache)
+    assert filepath.read_bytes() == png
+    assert image.size == main("hello").size
+    assert cache.stats()["images"].hits == 2
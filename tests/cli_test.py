@@ -0,0 +1,100 @@
+import argparse
+import io
+import zipfile
+
+import numpy as np
+import pytest
+
+from qpyr.cli import main, parse_mask, parse_non_negative_int, parse_positive_int, read_payloads
+from qpyr.main import get_matrix
+
+
+def test_read_payloads():
+    assert list(read_payloads(io.StringIO("a\r\n\nb c\n"))) == ["a", "b c"]
+    assert list(read_payloads(io.StringIO("1,x\n2,\n3,z\n"), use_csv=True, column="1")) == ["x", "z"]
+    assert list(read_payloads(io.StringIO("id,url\n1,x\n"), use_csv=True, column="url")) == ["x"]
+    with pytest.raises(ValueError):
+        read_payloads(io.StringIO("id\n1\n"), use_csv=True, column="url")
+
+
+def test_parse_ints():
+    assert parse_positive_int("1") == 1
+    assert parse_non_negative_int("0") == 0
+    for value in ["0", "-1", "1.5", "x"]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_positive_int(value)
+    with pytest.raises(argparse.ArgumentTypeError):
+        parse_non_negative_int("-1")
+
+
+def test_parse_mask():
+    assert parse_mask("0") == 0
+    assert parse_mask("7") == 7
+    assert parse_mask("fast") == "fast"
+    for value in ["8", "-1", "Fast", ""]:
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_mask(value)
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_main_zip(tmp_path, capsys, workers):
+    input_path = tmp_path / "payloads.txt"
+    input_path.write_text("hello\n" + "x" * 3000 + "\nworld\n")
+    output_path = tmp_path / "codes.zip"
+    argv = [str(input_path), "--output", str(output_path), "--format", "npy", "--workers", str(workers)]
+    assert main(argv + ["--chunk-size", "2"]) == 1
+
+    with zipfile.ZipFile(output_path) as zip_file:
+        assert sorted(zip_file.namelist()) == ["0.npy", "2.npy"]
+        assert np.array_equal(np.load(io.BytesIO(zip_file.read("2.npy"))), get_matrix("world"))
+    stderr = capsys.readouterr().err
+    assert "payload 1: Data too long" in stderr
+    assert "2 codes, 1 errors" in stderr
+
+
+def test_main_csv_directory(tmp_path, capsys):
+    input_path = tmp_path / "orders.csv"
+    input_path.write_text("id,url\n1,https://example.com/1\n2,https://example.com/2\n")
+    argv = [str(input_path), "--csv", "--column", "url", "--output", str(tmp_path / "codes"), "--quiet"]
+    assert main(argv + ["--format", "svg", "--shard-size", "1"]) == 0
+    assert (tmp_path / "codes" / "1" / "1.svg").read_bytes().startswith(b"<?xml")
+    assert capsys.readouterr().err == ""
+
+
+def test_main_invalid_mask(tmp_path, capsys):
+    input_path = tmp_path / "payloads.txt"
+    input_path.write_text("hello\n")
+    output_path = tmp_path / "codes.zip"
+    with pytest.raises(SystemExit):
+        main([str(input_path), "--output", str(output_path), "--mask", "9"])
+    assert "invalid mask '9'" in capsys.readouterr().err
+    assert not output_path.exists()
+
+
+def test_main_missing_input(tmp_path, capsys):
+    output_path = tmp_path / "codes.zip"
+    with pytest.raises(SystemExit):
+        main([str(tmp_path / "missing.txt"), "--output", str(output_path)])
+    assert "missing.txt" in capsys.readouterr().err
+    assert not output_path.exists()
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--chunk-size", "0"],
+        ["--cell-size", "0"],
+        ["--shard-size", "0"],
+        ["--workers", "-1"],
+        ["--csv", "--column", "url"],
+    ],
+)
+def test_main_invalid_options(tmp_path, capsys, options):
+    input_path = tmp_path / "payloads.txt"
+    input_path.write_text("id\nhello\n")
+    output_path = tmp_path / "codes.zip"
+    with pytest.raises(SystemExit) as excinfo:
+        main([str(input_path), "--output", str(output_path)] + options)
+    assert excinfo.value.code == 2
+    assert "error:" in capsys.readouterr().err
+    assert not output_path.exists()
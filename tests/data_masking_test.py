@@ -7,7 +7,9 @@ from qpyr._lib.data_masking import (
     get_masks,
     get_proportion_penalty,
     get_same_color_block_penalty,
+    get_estimated_penalty_scores,
     get_finder_pattern_penalty,
+    get_penalty_scores,
 )
 
 
@@ -52,6 +54,13 @@ def test_get_finder_pattern_penalty_many_points():
     assert excepted == result
 
 
+def test_get_finder_pattern_penalty_quiet_zone():
+    grid = np.array([[1, 0, 1, 1, 1, 0, 1, 0, 0]])
+    assert get_finder_pattern_penalty(grid) == 0
+    assert get_finder_pattern_penalty(grid, quiet_zone=2) == 40
+    assert get_finder_pattern_penalty(grid, quiet_zone=4) == 80
+
+
 def test_get_adjacent_modules_penalty():
     test_grid = np.array([[1, 0, 0, 0, 0, 0, 0, 1]])
     result = get_adjacent_modules_penalty(test_grid)
@@ -135,3 +144,40 @@ def test_get_masks():
     masks = get_masks()
     assert masks[7](21, 21) == True
     assert masks[3](15, 14) == False
+
+
+def test_get_penalty_scores():
+    grid = np.array(
+        [
+            [1, 1, 1, 1, 1, 0],
+            [0, 1, 0, 1, 0, 1],
+            [1, 0, 1, 0, 1, 0],
+            [0, 1, 0, 1, 0, 1],
+            [1, 1, 0, 0, 1, 0],
+            [0, 1, 1, 0, 0, 1],
+        ]
+    )
+    candidates = np.stack([grid, 1 - grid])
+    result = get_penalty_scores(candidates, quiet_zone=4)
+    for scores, candidate in zip(result.tolist(), candidates):
+        assert scores == [
+            get_adjacent_modules_penalty(candidate),
+            get_same_color_block_penalty(candidate),
+            get_finder_pattern_penalty(candidate, quiet_zone=4),
+            get_proportion_penalty(candidate),
+        ]
+    assert result[0, 0] == 3
+
+
+def test_get_estimated_penalty_scores():
+    rng = np.random.default_rng(0)
+    candidates = rng.integers(0, 2, size=(3, 8, 25, 25))
+    estimated = get_estimated_penalty_scores(candidates, quiet_zone=4)
+    assert estimated.shape == (3, 8, 4)
+    assert np.array_equal(estimated[..., [1, 3]], get_penalty_scores(candidates, quiet_zone=4)[..., [1, 3]])
+
+    # Every row and column of these grids is repeated once, so sampling every other one is exact.
+    doubled = np.kron(rng.integers(0, 2, size=(3, 12, 12)), np.ones((2, 2), dtype=int))
+    assert np.array_equal(
+        get_estimated_penalty_scores(doubled, quiet_zone=4, stride=2), get_penalty_scores(doubled, quiet_zone=4)
+    )
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from qpyr._lib.draw import draw
+
+
+def test_draw_black_and_white():
+    grid = np.array([[1, 0], [0, 1]])
+    image = draw(grid, cell_size=2)
+    assert image.mode == "1"
+    assert image.size == (4, 4)
+    assert np.array_equal(np.array(image), [[0, 0, 1, 1], [0, 0, 1, 1], [1, 1, 0, 0], [1, 1, 0, 0]])
+    assert draw(grid, mode="L").mode == "L"
+
+
+def test_draw_colors():
+    grid = np.array([[1, 0], [-1, -2]])
+    image = draw(grid, cell_size=1, dark_color="blue")
+    assert image.mode == "RGB"
+    assert np.array(image).tolist() == [[[0, 0, 255], [255, 255, 255]], [[211, 211, 211], [255, 0, 0]]]
+
+
+def test_draw_outline():
+    image = draw(np.array([[0, 0], [0, 0]]), cell_size=3, outline="red")
+    pixels = np.array(image)
+    assert pixels[0, 1].tolist() == pixels[3, 3].tolist() == [255, 0, 0]
+    assert pixels[1, 1].tolist() == [255, 255, 255]
+
+
+def test_draw_not_square():
+    with pytest.raises(ValueError):
+        draw(np.zeros((2, 3)))
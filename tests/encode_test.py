@@ -1,6 +1,20 @@
 import pytest
 
-from qpyr._lib.encode import get_best_mode, add_padding, get_best_version
+from qpyr._lib.encode import (
+    add_padding,
+    encode,
+    get_best_mode,
+    get_best_segmentation,
+    get_best_version,
+    get_boosted_ecl,
+    get_data_codewords,
+    get_optimal_segments,
+    get_segment_data,
+    get_segment_data_bits_length,
+    get_segment_terminator,
+    get_version_for_length,
+)
+from qpyr._lib.utils import BitBuffer, get_segment_character_bits_length
 
 
 @pytest.mark.parametrize(
@@ -11,11 +25,11 @@ def test_get_best_mode(data, expected_mode):
 
 
 def test_add_padding():
-    data = "0100001000010110111101101101011001010110011101100001011100110110010101100101011001000010110101101101011110010110000101110111011001010111001101101111011011010110010101100110011011110110111101100100011010010110010001100101011000010111001100101101011101110110010101100101011001010000"
+    data = BitBuffer("0100001000010110111101101101011001010110011101100001011100110110010101100101011001000010110101101101011110010110000101110111011001010111001101101111011011010110010101100110011011110110111101100100011010010110010001100101011000010111001100101101011101110110010101100101011001010000")
     version = 4
     ecl = "H"
     assert (
-        add_padding(data, version, ecl)
+        str(add_padding(data, version, ecl))
         == "010000100001011011110110110101100101011001110110000101110011011001010110010101100100001011010110110101111001011000010111011101100101011100110110111101101101011001010110011001101111011011110110010001101001011001000110010101100001011100110010110101110111011001010110010101100101000011101100"
     )
 
@@ -23,3 +37,106 @@ def test_add_padding():
 def test_get_best_version():
     data_segment = "0100100001100101011011000110110001101111001011000010000001110111011011110111001001101100011001000010000100100000001100010011001000110011010010000110010101101100011011000110111100101100001000000111011101101111011100100110110001100100001000010010000000110001001100100011001101001000011001010110110001101100011011110010110000100000011101110110111101110010011011000110010000100001001000000011000100110010001100110100100001100101011011000110110001101111001110000011001101101110011001000110010101001000011001010110110001101100011011110010110000100000011101110110111101110010011011000110010000100001001100010011001000110011010010000110010101101100011011000110111100111000001100110110111001100100011001010100100001100101011011000110110001101111001011000010000001110111011011110111001001101100011001000010000100110001001100100011001101001000011001010110110001101100011011110011100000110011011011100110010001100101010010000110010101101100011011000110111100101100001000000111011101101111011100100110110001100100001000010011000100110010001100110100100001100101011011000110110001101111001110000011001101101110011001000110010101001000011001010110110001101100011011110010110000100000011101110110111101110010011011000110010000100001001100010011001000110011010010000110010101101100011011000110111100111000001100110110111001100100011001010100100001100101011011000110110001101111001011000010000001110111011011110111001001101100011001000010000100110001001100100011001101001000011001010110110001101100011011110011100000110011011011100110010001100101010010000110010101101100011011000110111100101100001000000111011101101111011100100110110001100100001000010011000100110010001100110100100001100101011011000110110001101111001110000011001101101110011001000110010101001000011001010110110001101100011011110010110000100000011101110110111101110010011011000110010000100001"
     assert get_best_version(data_segment, mode="byte", ecl="H") == 16
+
+
+@pytest.mark.parametrize(
+    "data,mode,expected",
+    [
+        ("01234567", "numeric", "000000110001010110011000011"),
+        ("0123456789012345", "numeric", "000000110001010110011010100110111000010100111010100101"),
+        ("AC-42", "alphanumeric", "0011100111011100111001000010"),
+        ("Hi", "byte", "0100100001101001"),
+    ],
+)
+def test_get_segment_data(data, mode, expected):
+    assert str(get_segment_data(data, mode)) == expected
+
+
+@pytest.mark.parametrize(
+    "mode,version,expected",
+    [("numeric", 9, 10), ("numeric", 10, 12), ("alphanumeric", 26, 11), ("alphanumeric", 27, 13), ("byte", 40, 16)],
+)
+def test_get_segment_character_bits_length(mode, version, expected):
+    assert get_segment_character_bits_length(mode, version) == expected
+
+
+def test_get_segment_terminator():
+    assert str(get_segment_terminator(41, version=1, ecl="M")) == "0000"
+    assert str(get_segment_terminator(126, version=1, ecl="M")) == "00"
+    assert str(get_segment_terminator(128, version=1, ecl="M")) == ""
+
+
+def test_get_data_codewords_numeric():
+    version, data_codewords = get_data_codewords("01234567", ecl="M")
+    assert version == 1
+    assert data_codewords == bytes.fromhex("10200c566180ec11ec11ec11ec11ec11")
+    assert encode("01234567", ecl="M") == (1, data_codewords + bytes.fromhex("a524d4c1ed36c7872c55"))
+
+
+def test_encode_smaller_versions():
+    assert encode("1" * 41, ecl="L")[0] == 1
+    assert encode("A" * 25, ecl="L")[0] == 1
+    assert encode("a" * 25, ecl="L")[0] == 2
+
+
+@pytest.mark.parametrize(
+    "data,expected",
+    [
+        (
+            "HTTPS://EXAMPLE.COM/ORDER/1234567890123",
+            [("alphanumeric", "HTTPS://EXAMPLE.COM/ORDER/"), ("numeric", "1234567890123")],
+        ),
+        ("abc0123456789xyz", [("byte", "abc"), ("numeric", "0123456789"), ("byte", "xyz")]),
+        ("a1b", [("byte", "a1b")]),
+        ("", [("numeric", "")]),
+    ],
+)
+def test_get_optimal_segments(data, expected):
+    assert get_optimal_segments(data, version=1) == expected
+
+
+@pytest.mark.parametrize("data,mode", [("12345", "numeric"), ("AB1", "alphanumeric"), ("héllo", "byte")])
+def test_get_segment_data_bits_length(data, mode):
+    assert get_segment_data_bits_length(data, mode) == len(get_segment_data(data, mode))
+
+
+def test_get_best_segmentation():
+    assert get_best_segmentation("HTTPS://EXAMPLE.COM/ORDER/1234567890123", ecl="M") == (
+        2,
+        [("alphanumeric", "HTTPS://EXAMPLE.COM/ORDER/"), ("numeric", "1234567890123")],
+    )
+    # A single segment is kept when splitting does not save a version.
+    assert get_best_segmentation("ab12", ecl="M") == (1, [("byte", "ab12")])
+    assert get_best_segmentation("é" + "1" * 40, ecl="M") == (3, [("byte", "é" + "1" * 40)])
+    with pytest.raises(ValueError):
+        get_best_segmentation("1" * 7090, ecl="L")
+
+
+@pytest.mark.parametrize(
+    "length,mode,ecl,expected",
+    [
+        (41, "numeric", "L", 1),
+        (42, "numeric", "L", 2),
+        (17, "byte", "L", 1),
+        (2953, "byte", "L", 40),
+        (4, "byte", "H", 1),
+    ],
+)
+def test_get_version_for_length(length, mode, ecl, expected):
+    assert get_version_for_length(length, mode, ecl) == expected
+
+
+def test_get_version_for_length_too_long():
+    with pytest.raises(ValueError, match="Data too long"):
+        get_version_for_length(2954, "byte", "L")
+    with pytest.raises(ValueError, match="Data too long"):
+        get_version_for_length(18, "byte", "L", max_version=1)
+    with pytest.raises(ValueError, match="max_version"):
+        get_version_for_length(18, "byte", "L", max_version=50)
+
+
+def test_get_boosted_ecl():
+    assert get_boosted_ecl("hello", ecl="L") == "H"
+    assert get_boosted_ecl("x" * 15, ecl="L") == "L"
+    assert get_boosted_ecl("x" * 14, ecl="L") == "M"
+    assert encode("x" * 14, ecl="M")[0] == encode("x" * 14, ecl="L")[0]
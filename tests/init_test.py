@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import qpyr
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _loaded_modules(statement: str) -> set:
+    code = f"import sys\n{statement}\nprint(' '.join(sys.modules))"
+    result = subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True, capture_output=True, text=True)
+    return set(result.stdout.split())
+
+
+def test_import_is_lazy():
+    modules = _loaded_modules("import qpyr")
+    assert not {"numpy", "PIL", "multiprocessing", "qpyr._lib.matrix"} & modules
+
+
+def test_matrix_and_png_do_not_import_pil():
+    modules = _loaded_modules("import qpyr\nqpyr.write_png(qpyr.get_matrix('hello'))")
+    assert "numpy" in modules
+    assert not {"PIL", "concurrent.futures.process"} & modules
+
+
+def test_lazy_exports():
+    assert callable(qpyr.main)
+    assert qpyr.write_png is qpyr.__getattr__("write_png")
+    assert set(qpyr.__all__) <= set(dir(qpyr))
+    assert set(qpyr._LAZY_EXPORTS) <= set(qpyr.__all__)
+    with pytest.raises(AttributeError):
+        qpyr.missing
@@ -0,0 +1,24 @@
+import io
+
+import pytest
+from PIL import Image
+
+from qpyr._lib.output import write_image
+from qpyr._lib.png import write_png
+from qpyr._lib.vector import write_svg
+from qpyr.main import get_matrix
+
+QR_MATRIX = get_matrix("hello")
+
+
+@pytest.mark.parametrize("fileformat,writer", [("png", write_png), ("SVG", write_svg)])
+def test_write_image_native_writers(fileformat, writer):
+    assert write_image(QR_MATRIX, fileformat, cell_size=3) == writer(QR_MATRIX, cell_size=3)
+
+
+def test_write_image_pil_formats():
+    out = io.BytesIO()
+    assert write_image(QR_MATRIX, "jpg", out, cell_size=2) is None
+    image = Image.open(io.BytesIO(out.getvalue()))
+    assert image.format == "JPEG"
+    assert image.size == (58, 58)
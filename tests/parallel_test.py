@@ -0,0 +1,25 @@
+import numpy as np
+import pytest
+
+from qpyr._lib.batch import generate_matrices
+from qpyr._lib.parallel import generate_matrices_parallel, get_chunk_size
+
+
+def test_get_chunk_size():
+    assert get_chunk_size(10, workers=4) == 1
+    assert get_chunk_size(1000, workers=4) == 63
+    assert get_chunk_size(10**7, workers=4) == 1024
+
+
+def test_generate_matrices_parallel():
+    data = ["hello", "x" * 100, "world", "hello", "y" * 300]
+    result = generate_matrices_parallel(data, ecl="L", workers=2, chunksize=2)
+    expected = generate_matrices(data, ecl="L")
+    assert len(result) == len(expected)
+    for qr_matrix, expected_matrix in zip(result, expected):
+        assert np.array_equal(qr_matrix, expected_matrix)
+
+
+def test_generate_matrices_parallel_data_too_long():
+    with pytest.raises(ValueError, match="Data too long"):
+        generate_matrices_parallel(["a", "x" * 3000, "b"], ecl="H", workers=2, chunksize=1)
@@ -0,0 +1,52 @@
+import io
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from qpyr._lib.draw import draw
+from qpyr._lib.png import get_scanlines, write_png
+from qpyr.main import get_matrix, main
+
+GRID = np.array([[1, 0], [0, 1]])
+
+
+def test_get_scanlines():
+    assert get_scanlines(GRID, cell_size=2) == bytes([0, 0b00110000, 2, 0, 0, 0b11000000, 2, 0])
+
+
+def test_write_png_quiet_zone():
+    png = write_png(GRID, cell_size=3, quiet_zone=1)
+    image = Image.open(io.BytesIO(png))
+    assert image.mode == "1"
+    assert image.size == (12, 12)
+    expected = np.ones((4, 4), dtype=bool)
+    expected[1:3, 1:3] = GRID == 0
+    assert np.array_equal(np.array(image), np.repeat(np.repeat(expected, 3, axis=0), 3, axis=1))
+
+
+@pytest.mark.parametrize("data", ["hello", "x" * 500])
+def test_write_png_matches_draw(data):
+    qr_matrix = get_matrix(data)
+    out = io.BytesIO()
+    assert write_png(qr_matrix, out, cell_size=5) is None
+    image = Image.open(io.BytesIO(out.getvalue()))
+    assert np.array_equal(np.array(image), np.array(draw(qr_matrix, cell_size=5)))
+
+
+def test_write_png_compression_level():
+    qr_matrix = get_matrix("x" * 500)
+    fast, small = write_png(qr_matrix, compression_level=1), write_png(qr_matrix, compression_level=9)
+    assert len(small) <= len(fast)
+
+
+def test_write_png_not_square():
+    with pytest.raises(ValueError):
+        write_png(np.zeros((2, 3)))
+
+
+def test_main_png(tmp_path):
+    filepath = tmp_path / "qr.png"
+    image = main("hello", filepath=str(filepath))
+    assert filepath.read_bytes() == write_png(get_matrix("hello"))
+    assert np.array_equal(np.array(Image.open(filepath)), np.array(image))
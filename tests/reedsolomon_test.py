@@ -1,4 +1,12 @@
-from qpyr._lib.error_correction import add_ecc_and_interleave
+import numpy as np
+
+from qpyr._lib.error_correction import (
+    _reed_solomon_compute_divisor,
+    _reed_solomon_compute_remainders,
+    _reed_solomon_multiply,
+    add_ecc_and_interleave,
+    add_ecc_and_interleave_stack,
+)
 
 
 def test__add_ecc_and_interleave():
@@ -8,3 +16,41 @@ def test__add_ecc_and_interleave():
         b"@V\x86V\xc6\xc6\xf0\xec\x11\xec\x11\xec\x11\xec\x11\xec\x16O\xdf\xd4\x8c\x11\xd1\\/\xb7"
     )
     assert data_and_ecc == expected_result
+
+
+def test__reed_solomon_multiply():
+    assert _reed_solomon_multiply(0, 0x53) == 0
+    assert _reed_solomon_multiply(0x02, 0x80) == 0x1D
+    assert _reed_solomon_multiply(0x53, 0xCA) == _reed_solomon_multiply(0xCA, 0x53)
+
+
+# Expected codewords computed with the original, one block at a time implementation.
+VERSION_5_Q_CODEWORDS = [
+    bytes.fromhex(
+        "000f1e2e01101f2f02112030031221310413223205142333061524340716253508172636091827370a1928380b1a29390c1b2a3a"
+        "0d1c2b3b0e1d2c3c2d3d8255124420d802e0398392e7e21c2d7021517bad9c4d105f805e8eeb9eab8344d8d54183d34b61f20df9"
+        "da834376dc57f14aeb6eaf1cc76e9e240341bca4df1d8ba89584679a8a13"
+    ),
+    bytes.fromhex(
+        "3e4d5c6c3f4e5d6d404f5e6e41505f6f42516070435261714453627245546373465564744756657548576676495867774a596878"
+        "4b5a69794c5b6a7a6b7b9f53805996de66d8c05712063a3c2a51b2e0c6b744878d76c5c153264a899903c453d346267408d7c509"
+        "f3dc993dce331db7e7ce04dfed96564011167c1f957f29d2d1f26373e68f"
+    ),
+]
+
+
+def test__reed_solomon_compute_remainders():
+    divisor = _reed_solomon_compute_divisor(10)
+    blocks = np.array([list(b"@V\x86V\xc6\xc6\xf0\xec\x11\xec"), list(b"\x11\xec\x11\xec\x11\xec\x16O\xdf\xd4")])
+    result = _reed_solomon_compute_remainders(blocks.astype(np.uint8), divisor)
+    assert [bytes(row) for row in result] == [
+        bytes.fromhex("0b1ee94cb71a46a99f4a"),
+        bytes.fromhex("74de5d2140298ecbedb8"),
+    ]
+
+
+def test_add_ecc_and_interleave_stack():
+    data = np.arange(2 * 62, dtype=np.uint8).reshape(2, 62)  # version 5-Q has 2 short and 2 long blocks
+    result = add_ecc_and_interleave_stack(version=5, ecl="Q", data=data)
+    assert [row.tobytes() for row in result] == VERSION_5_Q_CODEWORDS
+    assert add_ecc_and_interleave(version=5, ecl="Q", data=bytearray(data[1].tobytes())) == VERSION_5_Q_CODEWORDS[1]
@@ -0,0 +1,62 @@
+import io
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from qpyr._lib.batch import generate_matrices
+from qpyr._lib.stream import DirectorySink, FileSink, stream_matrices
+
+
+def test_stream_matrices():
+    data = ["a", "b" * 100, "a", "c"]
+    items = list(stream_matrices(data, ecl="L", window=3))
+    assert [(item.index, item.payload, item.error) for item in items] == [(i, p, None) for i, p in enumerate(data)]
+    for item, expected in zip(items, generate_matrices(data, ecl="L")):
+        assert np.array_equal(item.result, expected)
+
+
+def test_stream_matrices_is_lazy():
+    consumed = []
+
+    def payloads():
+        for i in range(1000):
+            consumed.append(i)
+            yield str(i)
+
+    stream = stream_matrices(payloads(), window=10)
+    assert consumed == []
+    next(stream)
+    assert len(consumed) == 10
+
+
+def test_stream_matrices_reports_errors_per_item():
+    items = list(stream_matrices(["ok", "x" * 3000, "ok too"], ecl="L"))
+    assert [item.error is None for item in items] == [True, False, True]
+    assert "Data too long" in str(items[1].error)
+    assert items[1].result is None
+    assert items[2].result.shape == (29, 29)
+
+
+def test_stream_matrices_invalid_window():
+    with pytest.raises(ValueError):
+        stream_matrices(["a"], window=0)
+
+
+def test_directory_sink(tmp_path):
+    sink = DirectorySink(str(tmp_path / "out"), "svg", cell_size=2)
+    items = list(stream_matrices(["a", "x" * 3000, "b"], ecl="L", sink=sink))
+    assert items[0].result == os.path.join(str(tmp_path / "out"), "0.svg")
+    assert sorted(os.listdir(tmp_path / "out")) == ["0.svg", "2.svg"]
+
+
+def test_file_sink_and_callback():
+    out = io.BytesIO()
+    items = list(stream_matrices(["a", "b"], sink=FileSink(out, "png", cell_size=1)))
+    offset, length = items[1].result
+    assert items[0].result == (0, offset)
+    assert Image.open(io.BytesIO(out.getvalue()[offset : offset + length])).size == (29, 29)
+
+    sizes = [item.result for item in stream_matrices(["a", "b" * 50], sink=lambda i, p, grid: grid.shape[0])]
+    assert sizes == [29, 41]
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from qpyr._lib.encode import get_data_codewords
+from qpyr._lib.structured_append import (
+    generate_structured_append,
+    get_parity,
+    get_structured_append_codewords,
+    get_structured_append_header,
+    split_payload,
+)
+from qpyr._lib.utils import get_segment_character_bits_length
+
+
+def test_get_parity():
+    assert get_parity("") == 0
+    assert get_parity("AB") == 0x41 ^ 0x42
+
+
+def test_get_structured_append_header():
+    assert str(get_structured_append_header(2, total=4, parity=0x81)) == "0011" "0010" "0011" "10000001"
+    with pytest.raises(ValueError):
+        get_structured_append_header(0, total=17, parity=0)
+
+
+def test_split_payload():
+    data = "https://example.com/" + "abcdefghij" * 100
+    parts = split_payload(data, ecl="M", max_version=5)
+    assert "".join(parts) == data
+    assert len(parts) > 1
+    assert split_payload("hello", ecl="M") == ["hello"]
+    with pytest.raises(ValueError, match="Data too long"):
+        split_payload("x" * 5000, ecl="M", max_version=10)
+
+
+def test_get_structured_append_codewords():
+    data = "hello, world " * 20
+    symbols = get_structured_append_codewords(data, ecl="M", max_version=3)
+    assert all(version <= 3 for version, _ in symbols)
+
+    # Read the byte mode payloads back out of every symbol.
+    payload = b""
+    for index, (version, data_codewords) in enumerate(symbols):
+        bits = "".join(f"{codeword:08b}" for codeword in data_codewords)
+        assert bits[:20] == str(get_structured_append_header(index, len(symbols), get_parity(data)))
+        assert bits[20:24] == "0100"
+        count_bits = get_segment_character_bits_length("byte", version)
+        count = int(bits[24 : 24 + count_bits], 2)
+        start = 24 + count_bits
+        payload += bytes(int(bits[start + 8 * i : start + 8 * i + 8], 2) for i in range(count))
+    assert payload.decode() == data
+
+
+def test_generate_structured_append():
+    data = "x" * 500
+    result = generate_structured_append(data, ecl="L", max_version=4)
+    assert len(result) == len(split_payload(data, ecl="L", max_version=4))
+    assert all(len(qr_matrix) <= 33 + 8 for qr_matrix in result)
+    parallel_result = generate_structured_append(data, ecl="L", max_version=4, workers=2)
+    for qr_matrix, expected_matrix in zip(parallel_result, result):
+        assert np.array_equal(qr_matrix, expected_matrix)
+
+
+def test_get_data_codewords_max_version():
+    with pytest.raises(ValueError, match="Data too long"):
+        get_data_codewords("x" * 100, ecl="M", max_version=3)
+
+
+@pytest.mark.parametrize("max_version", [0, 41, 50])
+def test_invalid_max_version(max_version):
+    with pytest.raises(ValueError, match="max_version"):
+        generate_structured_append("x" * 5000, ecl="M", max_version=max_version)
+    with pytest.raises(ValueError, match="max_version"):
+        get_data_codewords("x", ecl="M", max_version=max_version)
@@ -0,0 +1,58 @@
+from qpyr._lib.batch import generate_matrices
+from qpyr._lib.draw import draw
+from qpyr._lib.encode import encode
+from qpyr._lib.matrix import masked_matrices
+from qpyr._lib.tracing import get_tracer, trace
+from qpyr._lib.vector import write_svg
+
+
+def test_trace_pipeline_stages():
+    with trace() as events:
+        version, codewords = encode("Hello, World!", ecl="M")
+        result = masked_matrices([codewords], version, "M")
+        draw(result.grids[0], cell_size=2)
+        write_svg(result.grids[0])
+    assert [event.stage for event in events] == [
+        "encode",
+        "error_correction",
+        "placement",
+        "masking",
+        "format_placement",
+        "mask_evaluation",
+        "rasterization",
+        "vector_output",
+    ]
+    assert all(event.duration >= 0 for event in events)
+    assert events[0].metadata["version"] == 1
+    evaluation = events[5].metadata
+    assert len(evaluation["penalties"][0]) == 8
+    assert evaluation["masks"] == result.masks.tolist()
+    assert min(evaluation["penalties"][0]) == result.scores[0]
+    assert events[6].metadata["size"] == (58, 58)
+    assert events[7].metadata["format"] == "svg"
+
+
+def test_trace_fixed_mask_skips_evaluation():
+    version, codewords = encode("Hello", ecl="L")
+    with trace() as events:
+        masked_matrices([codewords], version, "L", mask=3)
+    assert [event.stage for event in events] == ["placement", "masking", "format_placement"]
+    assert events[1].metadata["candidates"] == 1
+
+
+def test_trace_callback_and_batch():
+    received = []
+    with trace(received.append) as events:
+        generate_matrices(["a", "b", "c" * 100], ecl="L")
+    assert received == events
+    assert events[0].stage == "encode"
+    assert events[0].metadata["versions"] == [1, 5]
+    assert sum(event.metadata["count"] for event in events if event.stage == "error_correction") == 3
+
+
+def test_trace_is_scoped():
+    with trace() as events:
+        assert get_tracer() is not None
+    assert get_tracer() is None
+    encode("outside", ecl="M")
+    assert events == []
@@ -1,5 +1,41 @@
-from qpyr._lib.utils import get_total_data_capacity_bytes
+import pytest
+
+from qpyr._lib.utils import (
+    BitBuffer,
+    get_data_capacity_bits_table,
+    get_segment_capacity_bits_table,
+    get_total_data_capacity_bytes,
+)
 
 
 def test_get_data_codewords_per_block():
     assert get_total_data_capacity_bytes(ecl="H", version=11) == 140
+
+
+def test_capacity_tables():
+    assert get_data_capacity_bits_table("H")[10] == 140 * 8
+    table = get_segment_capacity_bits_table("byte", "L")
+    assert len(table) == 40
+    assert table[0] == 19 * 8 - 4 - 8
+    assert all(bits < next_bits for bits, next_bits in zip(table, table[1:]))
+
+
+def test_bit_buffer_append_bits():
+    buffer = BitBuffer()
+    buffer.append_bits(0b0100, 4)
+    buffer.append_bits(5, 8)
+    assert len(buffer) == 12
+    assert str(buffer) == "010000000101"
+    assert buffer.to_bytes() == b"\x40\x50"
+
+
+def test_bit_buffer_append_bytes():
+    buffer = BitBuffer("1")
+    buffer.append_bytes(b"\xff\x00")
+    assert buffer == BitBuffer("11111111100000000")
+    assert buffer.to_bytes() == b"\xff\x80\x00"
+
+
+def test_bit_buffer_value_out_of_range():
+    with pytest.raises(ValueError):
+        BitBuffer().append_bits(4, 2)
@@ -0,0 +1,44 @@
+import io
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+from qpyr._lib.vector import get_dark_rectangles, write_eps, write_pdf, write_svg
+
+GRID = np.array(
+    [
+        [1, 1, 0, 1],
+        [1, 1, 0, 1],
+        [0, 0, 0, 1],
+        [1, 0, 1, 1],
+    ]
+)
+
+
+def test_get_dark_rectangles():
+    assert get_dark_rectangles(GRID) == [(0, 0, 2, 2), (3, 0, 1, 3), (0, 3, 1, 1), (2, 3, 2, 1)]
+
+
+def test_write_svg():
+    svg = write_svg(GRID, cell_size=10)
+    root = ET.fromstring(svg)
+    assert root.get("width") == "40"
+    assert root[1].get("d") == "M0 0h2v2h-2zM3 0h1v3h-1zM0 3h1v1h-1zM2 3h2v1h-2z"
+
+    out = io.BytesIO()
+    assert write_svg(GRID, out, cell_size=10) is None
+    assert out.getvalue() == svg
+
+
+def test_write_eps():
+    eps = write_eps(GRID, cell_size=10)
+    assert eps.startswith(b"%!PS-Adobe-3.0 EPSF-3.0\n%%BoundingBox: 0 0 40 40\n")
+    assert b"\n0 2 2 2 R\n" in eps
+
+
+def test_write_pdf():
+    pdf = write_pdf(GRID, cell_size=10)
+    assert pdf.startswith(b"%PDF-1.4")
+    assert b"/MediaBox [0 0 40 40]" in pdf
+    startxref = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    assert pdf[startxref:].startswith(b"xref\n0 5\n")
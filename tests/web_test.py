@@ -0,0 +1,108 @@
+import asyncio
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+
+from qpyr._lib.png import write_png
+from qpyr._lib.tracing import trace
+from qpyr._lib.web import ASGIApp, WSGIApp, etag_matches, get_etag, parse_query
+from qpyr.main import get_matrix
+
+
+def wsgi_get(app, query_string, method="GET", **headers):
+    environ = {"REQUEST_METHOD": method, "QUERY_STRING": query_string, **headers}
+    setup_testing_defaults(environ)
+    response = {}
+
+    def start_response(status, response_headers):
+        response["status"], response["headers"] = status, dict(response_headers)
+
+    body = b"".join(app(environ, start_response))
+    return response["status"], response["headers"], body
+
+
+def asgi_get(app, query_string, method="GET", headers=()):
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "method": method, "query_string": query_string.encode(), "headers": list(headers)}
+    asyncio.run(app(scope, receive, send))
+    return messages[0]["status"], dict(messages[0]["headers"]), messages[1]["body"]
+
+
+def test_parse_query():
+    assert parse_query("data=a%20b&ecl=q&format=SVG&scale=4") == ("a b", "Q", "svg", 4)
+    assert parse_query("data=") == ("", "M", "png", 10)
+    for query_string in ["", "data=a&ecl=X", "data=a&format=gif", "data=a&scale=0", "data=a&scale=x"]:
+        with pytest.raises(ValueError):
+            parse_query(query_string)
+
+
+def test_etag():
+    etag = get_etag(parse_query("data=hello"))
+    assert etag.startswith('"') and etag != get_etag(parse_query("data=hello&scale=4"))
+    assert etag_matches(etag, f'"other", W/{etag}')
+    assert etag_matches(etag, "*")
+    assert not etag_matches(etag, '"other"') and not etag_matches(etag, None)
+
+
+def test_wsgi_app():
+    app = WSGIApp()
+    status, headers, body = wsgi_get(app, "data=hello&scale=2")
+    assert status == "200 OK"
+    assert headers["Content-Type"] == "image/png"
+    assert headers["Cache-Control"] == "public, max-age=31536000, immutable"
+    assert body == write_png(get_matrix("hello"), cell_size=2)
+
+    with trace() as events:
+        assert wsgi_get(app, "data=hello&scale=2")[2] == body
+        status, headers, body = wsgi_get(app, "data=hello&scale=2", HTTP_IF_NONE_MATCH=headers["ETag"])
+    assert events == []  # repeat hits never run the pipeline
+    assert status == "304 Not Modified" and body == b""
+
+    assert wsgi_get(app, "data=hello", method="HEAD")[2] == b""
+    assert wsgi_get(app, "data=hello&format=svg")[1]["Content-Type"] == "image/svg+xml"
+
+
+def test_wsgi_app_errors():
+    app = WSGIApp()
+    status, headers, body = wsgi_get(app, "data=" + "x" * 3000 + "&ecl=H")
+    assert status == "400 Bad Request"
+    assert headers["Cache-Control"] == "no-store"
+    assert body == b"Data too long\n"
+    assert wsgi_get(app, "format=png")[0] == "400 Bad Request"
+    status, headers, _ = wsgi_get(app, "data=hello", method="POST")
+    assert status == "405 Method Not Allowed" and headers["Allow"] == "GET, HEAD"
+
+
+def test_asgi_app():
+    app = ASGIApp()
+    status, headers, body = asgi_get(app, "data=hello&format=pdf")
+    assert status == 200
+    assert headers[b"content-type"] == b"application/pdf"
+    assert body.startswith(b"%PDF")
+
+    assert asgi_get(app, "data=hello&format=pdf")[2] == body
+    assert app.cache.stats()["images"].hits == 1
+    status, _, body = asgi_get(app, "data=hello&format=pdf", headers=[(b"if-none-match", headers[b"etag"])])
+    assert status == 304 and body == b""
+    assert asgi_get(app, "data=" + "x" * 3000)[0] == 400
+
+
+def test_asgi_lifespan():
+    messages = iter([{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}])
+    sent = []
+
+    async def receive():
+        return next(messages)
+
+    async def send(message):
+        sent.append(message["type"])
+
+    asyncio.run(ASGIApp()({"type": "lifespan"}, receive, send))
+    assert sent == ["lifespan.startup.complete", "lifespan.shutdown.complete"]